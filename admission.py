@@ -0,0 +1,78 @@
+'''
+Admission control of the full pipeline.
+The memory a run needs grows with the number of issues and pull requests of the repository, which a one-result
+search (total_count) tells before anything is fetched. A run is admitted while fewer than ADMISSION_MAX_RUNS runs
+are in progress and their estimated memory stays within ADMISSION_MEMORY_MB; otherwise it waits for room up to
+ADMISSION_QUEUE_TIMEOUT seconds and is then refused, and the caller answers 503 with Retry-After.
+A run larger than the whole budget is admitted only when nothing else is running.
+The count branches of /api/github are cheap and never go through admission control.
+'''
+import os
+import threading
+import time
+import metrics
+
+# Maximum number of full pipelines run at the same time (0: no admission control)
+ADMISSION_MAX_RUNS = int(os.environ.get('ADMISSION_MAX_RUNS', 2))
+# Memory (MB) the admitted runs may use together, e.g. 60% of a 1 GiB instance
+ADMISSION_MEMORY_MB = float(os.environ.get('ADMISSION_MEMORY_MB', 600))
+# Estimated memory of a run: a fixed part plus a part per issue and pull request
+ADMISSION_BASE_MB = float(os.environ.get('ADMISSION_BASE_MB', 40))
+ADMISSION_KB_PER_ITEM = float(os.environ.get('ADMISSION_KB_PER_ITEM', 4))
+# Seconds a request waits for room before it is refused
+ADMISSION_QUEUE_TIMEOUT = float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 30))
+# Retry-After of a refused request
+ADMISSION_RETRY_AFTER = int(os.environ.get('ADMISSION_RETRY_AFTER', 30))
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after=ADMISSION_RETRY_AFTER):
+        super().__init__("Service Overloaded")
+        self.retry_after = retry_after
+
+
+def estimate_mb(item_count):
+    return ADMISSION_BASE_MB + item_count * ADMISSION_KB_PER_ITEM / 1024
+
+
+class AdmissionControl:
+    def __init__(self, max_runs=ADMISSION_MAX_RUNS, memory_mb=ADMISSION_MEMORY_MB):
+        self.max_runs = max_runs
+        self.memory_mb = memory_mb
+        self.condition = threading.Condition()
+        self.runs = 0
+        self.used_mb = 0.0
+
+    def enabled(self):
+        return self.max_runs > 0
+
+    def fits(self, cost_mb):
+        if self.runs == 0:
+            return True
+        return self.runs < self.max_runs and self.used_mb + cost_mb <= self.memory_mb
+
+    '''
+    wait until a run of cost_mb fits, at most timeout seconds (None: as long as it takes).
+    Raises Overloaded if it still does not fit
+    '''
+    def acquire(self, cost_mb, timeout=ADMISSION_QUEUE_TIMEOUT):
+        if not self.enabled():
+            return
+        deadline = None if timeout is None else time.time() + timeout
+        with self.condition:
+            while not self.fits(cost_mb):
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    metrics.admission_rejections.inc()
+                    raise Overloaded()
+                self.condition.wait(remaining)
+            self.runs += 1
+            self.used_mb += cost_mb
+
+    def release(self, cost_mb):
+        if not self.enabled():
+            return
+        with self.condition:
+            self.runs -= 1
+            self.used_mb -= cost_mb
+            self.condition.notify_all()
@@ -0,0 +1,78 @@
+'''
+Vectorized time series aggregation of the GitHub events of a repository.
+The dates of each event type are parsed once into an array of day numbers and counted per day with a single
+bincount; the week and month series are rolled up from the daily counts. Every series is serialized straight
+to the [period, count] lists returned to the React app, with the same period labels as pandas periods
+('2024-10-21', '2024-10-21/2024-10-27', '2024-10').
+'''
+import numpy as np
+
+FREQUENCIES = ('day', 'week', 'month')
+
+
+'''
+function to parse 'YYYY-MM-DD' dates into a sorted array of day numbers (days since 1970-01-01).
+Missing dates (None), e.g. the closed_at of an open issue, are dropped
+'''
+def to_days(dates):
+    days = np.array(dates, dtype='datetime64[D]')
+    days = days[~np.isnat(days)]
+    days.sort()
+    return days.astype(np.int64)
+
+
+'''
+key of the period of every day number: the day itself, the Monday of its week or its month number
+'''
+def period_keys(day_numbers, freq):
+    if freq == 'day':
+        return day_numbers
+    if freq == 'week':
+        # 1970-01-01 was a Thursday, weeks run from Monday to Sunday like pandas 'W' periods
+        return day_numbers - (day_numbers + 3) % 7
+    return day_numbers.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+
+def period_labels(keys, freq):
+    if freq == 'day':
+        return np.datetime_as_string(keys.astype('datetime64[D]'))
+    if freq == 'week':
+        starts = np.datetime_as_string(keys.astype('datetime64[D]'))
+        ends = np.datetime_as_string((keys + 6).astype('datetime64[D]'))
+        return np.char.add(np.char.add(starts, '/'), ends)
+    return np.datetime_as_string(keys.astype('datetime64[M]'))
+
+
+'''
+function to count the days per period of freq, from the period of the first day to the period of the last one
+'''
+def rollup(day_counts, first_day, freq):
+    day_numbers = np.arange(first_day, first_day + len(day_counts), dtype=np.int64)
+    keys = period_keys(day_numbers, freq)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    counts = np.add.reduceat(day_counts, starts)
+    labels = period_labels(keys[starts], freq)
+    return [[label, int(count)] for label, count in zip(labels.tolist(), counts.tolist())]
+
+
+'''
+function to build the day, week and month series of one event type.
+The series spans the first to the last event; without any event it is all zeros from empty_start to empty_end
+'''
+def event_series(days, empty_start, empty_end):
+    if len(days) > 0:
+        first_day = days[0]
+        day_counts = np.bincount(days - first_day)
+    else:
+        first_day, last_day = to_days([str(empty_start), str(empty_end)])
+        day_counts = np.zeros(last_day - first_day + 1, dtype=np.int64)
+    return {freq: rollup(day_counts, first_day, freq) for freq in FREQUENCIES}
+
+
+'''
+function to aggregate every event type at every frequency.
+events maps an event type (e.g. "issues_created") to its list of 'YYYY-MM-DD' dates.
+Returns {event type: {"day": [[period, count], ...], "week": [...], "month": [...]}}
+'''
+def aggregate(events, empty_start, empty_end):
+    return {event: event_series(to_days(dates), empty_start, empty_end) for event, dates in events.items()}
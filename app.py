@@ -21,17 +21,109 @@ from flask_cors import CORS
 import json
 import dateutil.relativedelta
 from dateutil import *
-from datetime import date, datetime
-import pandas as pd
-import requests
+from datetime import date, datetime, timedelta
 import time
 import re
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import http_client
+from rate_limit import scheduler, resource_for_url, is_rate_limited
+from http_cache import ResponseCache, cacheable
+import issue_store
+import search_windows
+import aggregation
+import ingest
+import jobs
+import forecast_cache
+import forecast_payload
+import single_flight
+import warmup
+import metrics
+import admission
+import series_index
+import forecast_resilience
 
 # Initilize flask app
 app = Flask(__name__)
 # Handles CORS (cross-origin resource sharing)
 CORS(app)
 
+# Cache of GitHub responses shared by every request of this process
+response_cache = ResponseCache()
+# Forecast responses by content of the forecast request
+forecast_results = forecast_cache.ForecastCache()
+# Computations of /api/github currently running, by request
+in_flight = single_flight.SingleFlight()
+# Background workers of the job mode of /api/github
+job_queue = jobs.JobQueue()
+# Memory and run budget of the full pipelines
+admission_control = admission.AdmissionControl()
+
+# Update your Google cloud deployed LSTM app URL (NOTE: DO NOT REMOVE "/")
+LSTM_API_URL = http_client.LSTM_BASE_URL + "api/forecast"
+LSTM_API_URL_STAT = http_client.LSTM_BASE_URL + "api/stat"
+LSTM_API_URL_FB = http_client.LSTM_BASE_URL + "api/fbprophet"
+
+""" LSTM_API_URL = "http://127.0.0.1:8080/" + "api/forecast"
+LSTM_API_URL_STAT = "http://127.0.0.1:8080/" + "api/stat"
+LSTM_API_URL_FB = "http://127.0.0.1:8080/" + "api/fbprophet"
+"""
+
+GITHUB_URL = http_client.GITHUB_API_URL
+GITHUB_GRAPHQL_URL = GITHUB_URL + "graphql"
+
+# Branches of a repository with the date of their head commit, in the order of the REST /branches endpoint
+BRANCH_HEADS_QUERY = '''
+query($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    refs(refPrefix: "refs/heads/", first: 100, after: $cursor, orderBy: {field: ALPHABETICAL, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        name
+        target { ... on Commit { oid committedDate } }
+      }
+    }
+  }
+}
+'''
+
+# Stages of the full pipeline of a repository, in the order they complete
+REPORT_STAGES = ["repository", "issues", "commits", "branches", "releases", "aggregation", "forecasts"]
+
+# Issue counts of the count branches and the state they are restricted to
+COUNT_SEARCH_STATES = {
+    "issues": None,
+    "issues_open": "open",
+    "issues_closed": "closed",
+}
+
+# Maximum number of forecast requests sent to the LSTM microservice at the same time
+FORECAST_MAX_WORKERS = int(os.environ.get('FORECAST_MAX_WORKERS', 6))
+# Maximum number of linked GitHub pages fetched at the same time by pagination()
+PAGINATION_MAX_WORKERS = int(os.environ.get('PAGINATION_MAX_WORKERS', 4))
+# How the head commit of each branch is resolved: "graphql" (batched) or "rest" (one call per branch)
+BRANCHES_MODE = os.environ.get('BRANCHES_MODE', 'graphql')
+# How the count branches fetch their counts: "graphql" (one aliased query) or "rest" (concurrent calls)
+COUNTS_MODE = os.environ.get('COUNTS_MODE', 'graphql')
+# Maximum number of REST count calls sent at the same time
+COUNTS_MAX_WORKERS = int(os.environ.get('COUNTS_MAX_WORKERS', 8))
+# Source of the daily commit series: "rest" pages through every commit, "graphql" asks for the daily commit counts
+# (history totalCount) and "stats" uses the precomputed /stats/commit_activity of the past year and GraphQL before it
+COMMITS_MODE = os.environ.get('COMMITS_MODE', 'rest')
+# Days counted by one GraphQL history query
+COMMIT_HISTORY_BATCH = int(os.environ.get('COMMIT_HISTORY_BATCH', 100))
+# Seconds after which /stats/commit_activity is asked again once GitHub answered 202 (still computing)
+COMMIT_STATS_RETRY = float(os.environ.get('COMMIT_STATS_RETRY', 30))
+# Seconds the statistics fetched by that retry are kept for the next request of the repository
+COMMIT_STATS_TTL = float(os.environ.get('COMMIT_STATS_TTL', 600))
+# Maximum number of times a rate limited GitHub call is retried
+GITHUB_MAX_RETRIES = int(os.environ.get('GITHUB_MAX_RETRIES', 5))
+
+# Raised when GitHub does not return the search results of a repository
+class DataNotAvailable(Exception):
+    pass
+
 # Add response headers to accept all types of  requests
 def build_preflight_response():
     response = make_response()
@@ -48,17 +140,232 @@ def build_actual_response(response):
                          "PUT, GET, POST, DELETE, OPTIONS")
     return response
 
+'''
+function to send a GET request to the GitHub API through the rate limit scheduler.
+The scheduler holds the call back while its bucket (core or search) is exhausted, and a call
+rejected by a rate limit is retried once the bucket allows it. Any other response is returned as is.
+Each attempt is authenticated with the token of the pool picked by the scheduler
+'''
+def github_request(method, url, **kwargs):
+    resource = resource_for_url(url)
+    for attempt in range(GITHUB_MAX_RETRIES + 1):
+        token = scheduler.acquire(resource)
+        if token is not None:
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), "Authorization": f'token {token}'}
+        response = http_client.request(method, url, **kwargs)
+        scheduler.update(resource, response, token)
+        if not is_rate_limited(response):
+            break
+        if attempt < GITHUB_MAX_RETRIES:
+            metrics.github_retries.inc(resource=resource)
+    return response
+
+
+'''
+function to send a GET request to the GitHub API through the response cache.
+A fresh cached response is returned without any call, a stale one is revalidated with its ETag and a
+304 Not Modified returns the cached body. Only the endpoints of GITHUB_CACHE_ENDPOINTS go through the cache
+(see http_cache.py); search results in particular are always fetched, they change with every new issue
+'''
+def github_get(url, headers=None, params=None):
+    if resource_for_url(url) == 'search' or not cacheable(url):
+        return github_request('GET', url, headers=headers, params=params)
+    key = response_cache.key(url, params)
+    entry = response_cache.get(key)
+    if entry is not None and entry.is_fresh(response_cache.ttl):
+        return entry.to_response()
+    request_headers = dict(headers or {})
+    if entry is not None:
+        request_headers.update(entry.validators())
+    response = github_request('GET', url, headers=request_headers, params=params)
+    if response.status_code == 304 and entry is not None:
+        response_cache.touch(key)
+        return entry.to_response()
+    response_cache.put(key, response)
+    return response
+
+
+'''
+function to run a query against the GitHub GraphQL API. Returns the "data" of the response,
+or None if the query was rejected (GraphQL reports most errors with a 200 status)
+'''
+def github_graphql(query, variables):
+    response = github_request('POST', GITHUB_GRAPHQL_URL, json={"query": query, "variables": variables})
+    if response.status_code != 200:
+        return None
+    response = response.json()
+    if response.get("errors") or response.get("data") is None:
+        return None
+    return response["data"]
+
+
+'''
+function to resolve the head commit of every branch of a repository with GraphQL, 100 branches per call,
+instead of one REST commit lookup per branch. Branches whose head commit is older than date_24m_back are dropped.
+Returns None if the query fails so that the caller can fall back to the REST lookups
+'''
+def fetch_branches_graphql(repo_name, date_24m_back):
+    owner, name = repo_name.split("/")
+    branches_list = []
+    cursor = None
+    while(True):
+        result = github_graphql(BRANCH_HEADS_QUERY, {"owner": owner, "name": name, "cursor": cursor})
+        if result is None or result.get("repository") is None:
+            return None
+        refs = result["repository"]["refs"]
+        for ref in refs["nodes"]:
+            target = ref["target"]
+            # refs pointing at something other than a commit have no committedDate
+            if target is None or target.get("committedDate") is None:
+                continue
+            data = {}
+            data['branch_commit_at'] = target['committedDate'][0:10]
+            data['issue_number'] = target['oid']
+            if datetime.strptime(data['branch_commit_at'], '%Y-%m-%d').date() < date_24m_back:
+                continue
+            branches_list.append(data)
+        if not refs["pageInfo"]["hasNextPage"]:
+            break
+        cursor = refs["pageInfo"]["endCursor"]
+    return branches_list
+
+
+'''
+function to count the commits of each day from start to end (dates, inclusive) on the default branch with GraphQL,
+COMMIT_HISTORY_BATCH days (aliased history totalCount fields) per query instead of listing every commit.
+Returns {date: count}, or None if a query fails
+'''
+def fetch_commit_days_graphql(repo_name, start, end):
+    owner, name = repo_name.split("/")
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    batches = [days[i:i + COMMIT_HISTORY_BATCH] for i in range(0, len(days), COMMIT_HISTORY_BATCH)]
+
+    def count_batch(batch):
+        fields = [f'd{i}: history(since: "{day}T00:00:00Z", until: "{day}T23:59:59Z") {{ totalCount }}'
+                  for i, day in enumerate(batch)]
+        query = ('query($owner: String!, $name: String!) {\n  repository(owner: $owner, name: $name) {\n'
+                 '    defaultBranchRef { target { ... on Commit {\n      ' + '\n      '.join(fields) + '\n    } } }\n  }\n}')
+        result = github_graphql(query, {"owner": owner, "name": name})
+        if result is None or result.get("repository") is None or result["repository"]["defaultBranchRef"] is None:
+            return None
+        target = result["repository"]["defaultBranchRef"]["target"]
+        return {day: target[f'd{i}']["totalCount"] for i, day in enumerate(batch)}
+
+    commit_days = {}
+    max_workers = max(1, min(PAGINATION_MAX_WORKERS, len(batches)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for counts in executor.map(count_batch, batches):
+            if counts is None:
+                return None
+            commit_days.update(counts)
+    return commit_days
+
+
+# repository -> (fetched_at, weeks) of /stats/commit_activity answered to a background retry
+commit_activity_results = {}
+# repositories with a background retry waiting
+commit_activity_retries = set()
+commit_activity_lock = threading.Lock()
+
+
+'''
+function to ask /stats/commit_activity of a repository again, in the background, and keep its weeks once computed
+'''
+def retry_commit_activity(repo_name, stats_url):
+    try:
+        response = github_get(stats_url)
+        if response.status_code == 200 and isinstance(response.json(), list):
+            with commit_activity_lock:
+                commit_activity_results[repo_name] = (time.time(), response.json())
+    finally:
+        with commit_activity_lock:
+            commit_activity_retries.discard(repo_name)
+
+
+'''
+function to read the daily commit counts of the past 52 weeks from /stats/commit_activity, which GitHub precomputes.
+GitHub answers 202 while it is still computing them: instead of waiting, None is returned so the caller falls back
+and the statistics are asked again in the background after COMMIT_STATS_RETRY seconds (once per repository); that
+answer is kept COMMIT_STATS_TTL seconds and used by the next request instead of a call.
+Returns {date: count} from the first day of the oldest week, or None
+'''
+def fetch_commit_activity(repo_name):
+    with commit_activity_lock:
+        result = commit_activity_results.pop(repo_name, None)
+    if result is not None and time.time() - result[0] <= COMMIT_STATS_TTL:
+        weeks = result[1]
+    else:
+        stats_url = GITHUB_URL + "repos/" + repo_name + "/stats/commit_activity"
+        response = github_get(stats_url)
+        if response.status_code == 202:
+            with commit_activity_lock:
+                if repo_name not in commit_activity_retries:
+                    commit_activity_retries.add(repo_name)
+                    retry = threading.Timer(COMMIT_STATS_RETRY, retry_commit_activity, args=(repo_name, stats_url))
+                    retry.daemon = True
+                    retry.start()
+            return None
+        if response.status_code != 200:
+            return None
+        weeks = response.json()
+    if not isinstance(weeks, list) or not weeks:
+        return None
+    commit_days = {}
+    for week in weeks:
+        # each week starts on Sunday, days are counted from Sunday to Saturday
+        week_start = datetime.utcfromtimestamp(week["week"]).date()
+        for offset, count in enumerate(week["days"]):
+            commit_days[week_start + timedelta(days=offset)] = count
+    return commit_days
+
+
+'''
+function to build the daily commit series of COMMITS_MODE=graphql or stats from date_24m_back to today.
+In stats mode the days before the past 52 weeks (or all of them while GitHub is computing the statistics) are
+counted with GraphQL. Returns {date: count}, or None when the commits have to be paged with the REST API
+'''
+def fetch_commit_days(repo_name, date_24m_back, today):
+    commit_days = {}
+    end = today
+    if COMMITS_MODE == "stats":
+        activity = fetch_commit_activity(repo_name)
+        if activity is not None:
+            commit_days = {day: count for day, count in activity.items() if date_24m_back <= day <= today}
+            end = min(activity) - timedelta(days=1)
+    if end >= date_24m_back:
+        older_days = fetch_commit_days_graphql(repo_name, date_24m_back, end)
+        if older_days is None:
+            return None
+        commit_days.update(older_days)
+    return commit_days
+
+
 '''
 function to handle pagination of github api. This will ensure we get all data from linked pages
+Once the last page number is known from the Link header, pages 2..N are fetched concurrently
+(at most PAGINATION_MAX_WORKERS at a time) and reassembled in page order
+With consume, each page is handed to consume(page_items) in page order as it arrives and is not kept
 '''
-def pagination(search_issues_headers, query_url, token, type):
+def pagination(search_issues_headers, query_url, token, type, consume=None):
     headers = {
         "Authorization": f'token {token}'
     }
-    params = {
-        "state": "open"
-    }
     issues_items = []
+
+    def fetch_page(page_number):
+        params = {
+            "state": "open",
+            "page": page_number
+        }
+        # github_get waits for the rate limit budget, so only real errors are left here
+        inter_result = github_get(query_url, headers=headers, params=params)
+        inter_result.raise_for_status()
+        inter_result = inter_result.json()
+        if type == "issue":
+            return inter_result.get("items")
+        # commit, releases and branches pages are plain lists
+        return inter_result
+
     if 'Link' in search_issues_headers:
             links = search_issues_headers.get("Link")
             if 'rel="last"' in links:
@@ -71,55 +378,341 @@ def pagination(search_issues_headers, query_url, token, type):
                 last_page_number = int(last_page_url.split('page=')[-1])
                 
                 # Fetch issues for remaining pages
-                for page_number in range(2, last_page_number + 1):
-                    params["page"] = page_number
-                    inter_result = requests.get(query_url, headers=headers, params=params)
-                    inter_result = inter_result.json()
-                    '''
-                    code to handle github API rate limit 
-                    '''
-                    while(True):
-                        if('message' in inter_result):
-                            time.sleep(10)
-                            inter_result = requests.get(query_url, headers=headers, params=params)
-                            
-                            inter_result= inter_result.json()
-                            #inter_result = inter_result.get("items")
+                page_numbers = range(2, last_page_number + 1)
+                max_workers = max(1, min(PAGINATION_MAX_WORKERS, len(page_numbers)))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    # executor.map yields the pages in page order
+                    for page_items in executor.map(fetch_page, page_numbers):
+                        if consume is not None:
+                            consume(page_items)
                         else:
-                            break
-                    #inter_result = inter_result.json()
-                    if type == "issue":
-                        inter_result = inter_result.get("items")
-                        issues_items.extend(inter_result)
-                    elif type == "commit":
-                        issues_items.extend(inter_result)
-                    elif type == "releases":
-                        issues_items.extend(inter_result)
-                    elif type == "branches":
-                        issues_items.extend(inter_result)
+                            issues_items.extend(page_items)
     return issues_items
 
 
-@app.route('/') 
-def home():
-    return render_template('home.html')
 '''
-API route path is  "/api/forecast"
-This API will accept only POST request
+function to keep the fields of a GitHub search item (issue or pull request) that are used by the
+aggregation and the forecast service
 '''
-@app.route('/api/github', methods=['POST'])
-def github():
-    body = request.get_json()
-    # Extract the choosen repositories from the request
-    repo_name = body['repository']
-    starlist_status = body['starlist_status']
-    forklist_status = body['forklist_status']
-    linechart_status = body['linechart_status']
-    stackissues_status = body['stackissues_status']
+def normalize_issue(issue):
+    label_name = []
+    data = {}
+    current_issue = issue
+    # Get issue number
+    data['issue_number'] = current_issue["number"]
+    # Get created date of issue
+    if 'pull_request' in current_issue:
+        data['pull_created_at'] = current_issue["created_at"][0:10]                # key name 'pull_request' will be present for pull requests
+    else:
+        data['created_at'] = current_issue["created_at"][0:10]
+    #data['created_at'] = current_issue["created_at"][0:10]
+    if current_issue["closed_at"] == None:
+        data['closed_at'] = current_issue["closed_at"]
+    else:
+        # Get closed date of issue
+        data['closed_at'] = current_issue["closed_at"][0:10]
+    for label in current_issue["labels"]:
+        # Get label name of issue
+        label_name.append(label["name"])
+    data['labels'] = label_name
+    # It gives state of issue like closed or open
+    data['State'] = current_issue["state"]
+    # Get Author of issue
+    data['Author'] = current_issue["user"]["login"]
+    return data
+
+
+'''
+function to fetch the first page of search results of one created: window and its linked pages.
+Every page is added to columns as it arrives. Returns True once the window is fetched, or False (nothing
+added) when the window has more results than one search can return and can still be split
+'''
+def fetch_search_window(repo_name, window, headers, token, columns):
+    params = {
+    "state": "open"
+    }
+    #types = 'type:issue'   #commenting because if this is not included, it returns both issues and pulls
+    repo = 'repo:' + repo_name
+    ranges = search_windows.created_range(window)
+    # By default GitHub API returns only 30 results per page
+    # The maximum number of results per page is 100
+    # For more info, visit https://docs.github.com/en/rest/reference/repos 
+    per_page = 'per_page=100'
+    # Search query will create a query to fetch data for a given repository in a given time range
+    search_query = repo + ' ' + ranges
+
+    # Append the search query to the GitHub API URL 
+    query_url = GITHUB_URL + "search/issues?q=" + search_query + "&" + per_page
+    # github_get waits for the search rate limit budget before sending the query
+    search_issues = github_get(query_url, headers=headers, params=params)
+    search_issues_headers = search_issues.headers
+    # Convert the data obtained from GitHub API to JSON format
+    search_issues = search_issues.json()
+
+    if "items" not in search_issues:
+        raise DataNotAvailable("Data Not Available")
+    if search_issues["total_count"] > search_windows.SEARCH_RESULT_CAP:
+        if search_windows.can_split(window):
+            return False
+        # one second with more results than a search returns: only the first SEARCH_RESULT_CAP can be fetched
+        metrics.search_truncated_windows.inc()
+        app.logger.warning('search window %s of %s truncated: %d results, %d fetched', ranges, repo_name,
+                           search_issues["total_count"], search_windows.SEARCH_RESULT_CAP)
+    # Extract "items" from search issues
+    columns.add_page(search_issues["items"])
+    del search_issues
+    '''
+    fetching remaining issues from linked pages
+    '''
+    pagination(search_issues_headers, query_url, token, "issue", consume=columns.add_page)
+    return True
+
+
+'''
+function to fetch the issues and pull requests created in the past 24 months.
+The search starts with one window per month; windows over the search result cap are bisected
+and all windows are fetched concurrently. Issues and pull requests are returned newest first
+'''
+def fetch_issues_by_window(repo_name, headers, token):
+    windows = search_windows.month_windows(date.today(), 24)
+    date_24m_back = windows[-1][0]
+    # only the fields kept by normalize_issue() are extracted from each page, see ingest.py
+    columns = ingest.IssueColumns()
+    search_windows.collect_windows(
+        windows, lambda window: fetch_search_window(repo_name, window, headers, token, columns))
+    issues_reponse = columns.records(pulls=False)   # for type: issues
+    pull_responses = columns.records(pulls=True)   # for type:pr
+    return issues_reponse, pull_responses, date_24m_back
+
+
+'''
+function to bring the issue store of a repository up to date with the items updated since its last sync.
+Returns the stored issues and pull requests created since date_24m_back, or None if the repository
+needs a full fetch (never synced, last full sync too old, or too many updates for one search)
+'''
+def sync_issue_store(repo_name, headers, token, date_24m_back, synced_at):
+    if not issue_store.enabled():
+        return None
+    last_sync = issue_store.last_sync(repo_name)
+    if last_sync is None:
+        return None
+    params = {
+        "state": "open"
+    }
+    search_query = 'repo:' + repo_name + ' ' + 'updated:>=' + last_sync
+    query_url = GITHUB_URL + "search/issues?q=" + search_query + "&" + 'per_page=100'
+    search_issues = github_get(query_url, headers=headers, params=params)
+    search_issues_headers = search_issues.headers
+    search_issues = search_issues.json()
+    # search returns at most 1000 results, more updates than that need a full fetch
+    if "items" not in search_issues or search_issues["total_count"] > 1000:
+        return None
+    issues_items = search_issues["items"]
+    issues_items.extend(pagination(search_issues_headers, query_url, token, "issue"))
+    issue_store.merge(repo_name, [normalize_issue(issue) for issue in issues_items], synced_at)
+    return issue_store.load(repo_name, date_24m_back)
+
+
+'''
+function to build the search query of the issues created in the past 24 months of a repository,
+optionally restricted to a state (open or closed)
+'''
+def count_search_query(repo, state=None):
+    today = date.today()
+    last_month = today + dateutil.relativedelta.relativedelta(months=-24)
+    repo = 'repo:' + repo
+    ranges = 'created:' + str(last_month) + '..' + str(today)
+    types = 'type:issue'
+    search_query = repo + ' ' + ranges + ' ' + types
+    if state is not None:
+        search_query = search_query + ' ' + 'state:' + state
+    return search_query
+
+
+'''
+function to fetch the counts of many repositories with one aliased GraphQL query.
+Returns None if the query fails (e.g. an unknown repository) so that the caller can fall back to REST
+'''
+def fetch_repo_counts_graphql(repos, fields):
+    declarations = []
+    selections = []
+    variables = {}
+    for i, repo in enumerate(repos):
+        owner, name = repo.split("/")
+        if "stars" in fields or "forks" in fields:
+            declarations.extend([f'$owner{i}: String!', f'$name{i}: String!'])
+            selections.append(f'repo{i}: repository(owner: $owner{i}, name: $name{i}) {{ stargazerCount forkCount }}')
+            variables[f'owner{i}'] = owner
+            variables[f'name{i}'] = name
+        for field, state in COUNT_SEARCH_STATES.items():
+            if field in fields:
+                declarations.append(f'${field}{i}: String!')
+                selections.append(f'{field}{i}: search(type: ISSUE, query: ${field}{i}) {{ issueCount }}')
+                variables[f'{field}{i}'] = count_search_query(repo, state)
+    query = 'query(' + ', '.join(declarations) + ') {\n  ' + '\n  '.join(selections) + '\n}'
+    data = github_graphql(query, variables)
+    if data is None:
+        return None
+    counts = {}
+    for i, repo in enumerate(repos):
+        repo_counts = {}
+        if "stars" in fields or "forks" in fields:
+            if data.get(f'repo{i}') is None:
+                return None
+            repo_counts["stars"] = data[f'repo{i}']["stargazerCount"]
+            repo_counts["forks"] = data[f'repo{i}']["forkCount"]
+        for field in COUNT_SEARCH_STATES:
+            if field in fields:
+                repo_counts[field] = data[f'{field}{i}']["issueCount"]
+        counts[repo] = repo_counts
+    return counts
+
+
+'''
+function to fetch the counts of many repositories with concurrent REST calls, one per repository and count
+'''
+def fetch_repo_counts_rest(repos, fields):
+    def fetch_count(repo, field):
+        if field in ("stars", "forks"):
+            # both counts come from the same (cached) repository call
+            repository = github_get(GITHUB_URL + "repos/" + repo).json()
+            return repository["stargazers_count"] if field == "stars" else repository["forks_count"]
+        # only total_count is needed, so a single result per page is enough
+        query_url = GITHUB_URL + "search/issues?q=" + count_search_query(repo, COUNT_SEARCH_STATES[field]) + "&" + 'per_page=1'
+        return github_get(query_url, params={"state": "open"}).json()["total_count"]
+
+    tasks = [(repo, field) for repo in repos for field in fields]
+    max_workers = max(1, min(COUNTS_MAX_WORKERS, len(tasks)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        values = list(executor.map(lambda task: fetch_count(*task), tasks))
+    counts = {repo: {} for repo in repos}
+    for (repo, field), value in zip(tasks, values):
+        counts[repo][field] = value
+    return counts
+
+
+'''
+function to fetch counts of many repositories at once.
+fields is a list of "stars", "forks", "issues" (created in the past 24 months), "issues_open" and "issues_closed".
+Returns {repository: {field: count}}
+'''
+def fetch_repo_counts(repos, fields):
+    counts = None
+    if COUNTS_MODE == "graphql":
+        counts = fetch_repo_counts_graphql(repos, fields)
+    if counts is None:
+        counts = fetch_repo_counts_rest(repos, fields)
+    return counts
+
+
+'''
+function to send the forecast requests to the LSTM microservice concurrently.
+forecast_requests maps a json_response key to a (model url, request body, compact payload) triple and
+the JSON response of each model is returned under the same key.
+The compact payload (None in FORECAST_PAYLOAD=full mode) is sent instead of the request body when the
+model supports it, see forecast_payload.py. on_response(key, response) is called as each response arrives.
+A forecast that fails, or whose endpoint has an open circuit breaker (see forecast_resilience.py), does not fail
+the others: its block is {"error": "Forecast Not Available"} and the rest of the GitHub work is still returned
+'''
+def post_forecasts(forecast_requests, on_response=None):
+    # every series is hashed once for all of its models
+    digests = forecast_cache.SeriesDigests()
+
+    def forecast_key(model_url, forecast_body):
+        return forecast_cache.forecast_key(model_url, forecast_body, digests.get(forecast_body))
+
+    def cache_and_return(key, response):
+        forecast_response = response.json()
+        if response.status_code == 200:
+            forecast_results.put(key, forecast_response)
+        return forecast_response
+
+    def post_forecast(model_url, forecast_body, compact_payload):
+        # an unchanged series sent to the same model returns the same image urls
+        if compact_payload is not None and forecast_payload.compact_supported(model_url):
+            key = forecast_key(model_url, compact_payload.body)
+            cached = forecast_results.get(key)
+            if cached is not None:
+                return cached
+            response = forecast_resilience.call(
+                model_url, lambda: forecast_payload.post_compact(model_url, compact_payload))
+            if response is not None:
+                return cache_and_return(key, response)
+        key = forecast_key(model_url, forecast_body)
+        cached = forecast_results.get(key)
+        if cached is not None:
+            return cached
+        response = forecast_resilience.call(
+            model_url, lambda: http_client.post(model_url, json=forecast_body, headers={'content-type': 'application/json'}))
+        return cache_and_return(key, response)
+
+    def post_forecast_or_mark(model_url, forecast_body, compact_payload):
+        try:
+            return post_forecast(model_url, forecast_body, compact_payload)
+        except forecast_resilience.ForecastUnavailable:
+            return dict(forecast_resilience.UNAVAILABLE)
+
+    forecast_responses = {}
+
+    def add_response(key, forecast_response):
+        forecast_responses[key] = forecast_response
+        if on_response is not None:
+            on_response(key, forecast_response)
+
+    '''
+    batch mode: every uncached series and model goes in one request; anything it does not answer is sent per call
+    '''
+    if forecast_payload.FORECAST_PAYLOAD == "batch":
+        batch = {}
+        for key, (model_url, forecast_body, compact_payload) in forecast_requests.items():
+            if compact_payload is None:
+                continue
+            cached = forecast_results.get(forecast_key(model_url, compact_payload.body))
+            if cached is not None:
+                add_response(key, cached)
+            else:
+                batch[key] = (model_url, compact_payload)
+        batch_responses = None
+        if batch:
+            try:
+                batch_responses = forecast_resilience.call(
+                    forecast_payload.FORECAST_BATCH_URL, lambda: forecast_payload.post_batch(batch))
+            except forecast_resilience.ForecastUnavailable:
+                pass
+        if batch_responses is not None:
+            for key, forecast_response in batch_responses.items():
+                model_url, compact_payload = batch[key]
+                forecast_results.put(forecast_key(model_url, compact_payload.body), forecast_response)
+                add_response(key, forecast_response)
+
+    remaining = [key for key in forecast_requests if key not in forecast_responses]
+    max_workers = max(1, min(FORECAST_MAX_WORKERS, len(remaining)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for key in remaining:
+            futures[executor.submit(post_forecast_or_mark, *forecast_requests[key])] = key
+        for future in as_completed(futures):
+            add_response(futures[future], future.result())
+        return {key: forecast_responses[key] for key in forecast_requests}
+
+
+'''
+function to run the full pipeline of a repository: fetch its issues, pull requests, commits, branches and
+releases, aggregate them and forecast every series. Returns the json_response sent back to the React app.
+progress(stage) is called as each of REPORT_STAGES completes and emit(key, value) as soon as a section of
+json_response is ready (repository counts, aggregated series, then each forecast as it returns).
+Raises DataNotAvailable if the search fails
+'''
+def build_repo_report(repo_name, progress=None, emit=None):
+    if progress is None:
+        progress = lambda stage: None
+    # each call of progress also records the duration of the stage it completes
+    progress = metrics.StageTimer(progress).mark
+    if emit is None:
+        emit = lambda key, value: None
     # Add your own GitHub Token to run it local
     token = os.environ.get(
         'GITHUB_TOKEN')
-    GITHUB_URL = f"https://api.github.com/"
     headers = {
         "Authorization": f'token {token}'
     }
@@ -127,222 +720,32 @@ def github():
         "state": "open"
     }
 
-
-    #if block will return the star count of each repo if starlist_status is request body is true
-
-    if(starlist_status):
-        stars_count = []
-        repo_name = repo_name.split()
-        for r in repo_name:
-            repository_url = GITHUB_URL + "repos/" + r
-            # Fetch GitHub data from GitHub API
-            repository = requests.get(repository_url, headers=headers)
-            # Convert the data obtained from GitHub API to JSON format
-            repository = repository.json()
-            stars = repository["stargazers_count"]
-            temp_arr = [r, stars]
-            stars_count.append(temp_arr)
-        json_response = {
-            "starsCount": stars_count
-        }
-        return jsonify(json_response)
-    
-
-    #if block will return the fork count of each repo if forklist_status is request body is true
-
-    if(forklist_status):
-        forks_count = []
-        repo_name = repo_name.split('$')
-        for r in repo_name:
-            repository_url = GITHUB_URL + "repos/" + r
-            # Fetch GitHub data from GitHub API
-            repository = requests.get(repository_url, headers=headers)
-            # Convert the data obtained from GitHub API to JSON format
-            repository = repository.json()
-            forks = repository["forks_count"]
-            temp_arr = [r, forks]
-            forks_count.append(temp_arr)
-        json_response = {
-            "forksCount": forks_count
-        }
-        return jsonify(json_response)
-    
-    if(linechart_status):
-        issues_count = []
-        today = date.today()
-        last_month = today + dateutil.relativedelta.relativedelta(months=-24)
-        repo_name = repo_name.split('*')
-        for r in repo_name:
-            params = {
-            "state": "open"
-            }
-            repo = 'repo:' + r
-            ranges = 'created:' + str(last_month) + '..' + str(today)
-            types = 'type:issue'
-            per_page = 'per_page=100'
-            
-            search_query = repo + ' ' + ranges + ' ' + types
-
-            # Append the search query to the GitHub API URL 
-            query_url = GITHUB_URL + "search/issues?q=" + search_query + "&" + per_page
-            # Fetch GitHub data from GitHub API
-            repository = requests.get(query_url, headers=headers, params=params)
-            # Convert the data obtained from GitHub API to JSON format
-            repository = repository.json()
-            issues = repository["total_count"]
-            temp_arr = [r, issues]
-            issues_count.append(temp_arr)
-        json_response = {
-            "issuesCount": issues_count
-        }
-        return jsonify(json_response)
-    
-    if(stackissues_status):
-        issues_count = []
-        issues_count_close = []
-        today = date.today()
-        last_month = today + dateutil.relativedelta.relativedelta(months=-24)
-        repo_name = repo_name.split('@')
-        for r in repo_name:
-            params = {
-            "state": "open"
-            }
-            repo = 'repo:' + r
-            ranges = 'created:' + str(last_month) + '..' + str(today)
-            types = 'type:issue'
-            per_page = 'per_page=100'
-            state_open = 'state:open'
-            state_close = 'state:closed'
-            search_query = repo + ' ' + ranges + ' ' + types
-
-            # Append the search query to the GitHub API URL 
-            query_url = GITHUB_URL + "search/issues?q=" + search_query + ' ' + state_open + "&" + per_page
-            query_url_close = GITHUB_URL + "search/issues?q=" + search_query + ' ' + state_close + "&" + per_page
-            # Fetch GitHub data from GitHub API
-            repository = requests.get(query_url, headers=headers, params=params)
-            # Convert the data obtained from GitHub API to JSON format
-            repository = repository.json()
-            issues = repository["total_count"]
-            temp_arr = [r, issues]
-            issues_count.append(temp_arr)
-
-            repository = requests.get(query_url_close, headers=headers, params=params)
-            # Convert the data obtained from GitHub API to JSON format
-            repository = repository.json()
-            issues_close = repository["total_count"]
-            temp_arr = [r, issues_close]
-            issues_count_close.append(temp_arr)
-        json_response = {
-            "issuesCountOpen": issues_count,
-            "issuesCountClosed": issues_count_close
-        }
-        return jsonify(json_response)
-    
     repository_url = GITHUB_URL + "repos/" + repo_name
     # Fetch GitHub data from GitHub API
-    repository = requests.get(repository_url, headers=headers)
+    repository = github_get(repository_url, headers=headers)
     # Convert the data obtained from GitHub API to JSON format
     repository = repository.json()
 
-    today = date.today()
-    date_24m_back = today
-    issues_reponse = []   # for type: issues
-    pull_responses = []   # for type:pr
-    # Iterating to get issues for every month for the past 24 months
-    for i in range(24):
-        params = {
-        "state": "open"
-        }
-        last_month = today + dateutil.relativedelta.relativedelta(months=-1)
-        #types = 'type:issue'   #commenting because if this is not included, it returns both issues and pulls
-        repo = 'repo:' + repo_name
-        ranges = 'created:' + str(last_month) + '..' + str(today)
-        # By default GitHub API returns only 30 results per page
-        # The maximum number of results per page is 100
-        # For more info, visit https://docs.github.com/en/rest/reference/repos 
-        per_page = 'per_page=100'
-        # Search query will create a query to fetch data for a given repository in a given time range
-        search_query = repo + ' ' + ranges
+    emit("starCount", repository["stargazers_count"])
+    emit("forkCount", repository["forks_count"])
+    progress("repository")
 
-        # Append the search query to the GitHub API URL 
-        query_url = GITHUB_URL + "search/issues?q=" + search_query + "&" + per_page
-        # requsets.get will fetch requested query_url from the GitHub API
-        search_issues = requests.get(query_url, headers=headers, params=params)
-        search_issues_headers = search_issues.headers
-        # Convert the data obtained from GitHub API to JSON format
-        search_issues = search_issues.json()
-        
-        issues_items = []
-
-        '''
-        code to handle github API rate limit 
-        '''
-        while(True):
-            if('message' in search_issues):
-                time.sleep(10)
-                search_issues = requests.get(query_url, headers=headers, params=params)
-                # Convert the data obtained from GitHub API to JSON format
-                search_issues = search_issues.json()
-            else:
-                break
-        
-        
-        try:
-            # Extract "items" from search issues
-            issues_items = search_issues.get("items")
-        except KeyError:
-            error = {"error": "Data Not Available"}
-            resp = Response(json.dumps(error), mimetype='application/json')
-            resp.status_code = 500
-            return resp
-        
-        total_count = search_issues.get("total_count")
-        if total_count > 0 and len(issues_items) == 0:
-            #time.sleep(10) # just in case if there is a mismatch
-            search_issues = requests.get(query_url, headers=headers, params=params)
-            search_issues = search_issues.json()    
-        
-        '''
-        fetching remaining issues from linked pages
-        '''
-        pagination_response = pagination(search_issues_headers,query_url, token, "issue")
-        issues_items.extend(pagination_response)
-        
-        if issues_items is None:
-            continue
-        for issue in issues_items:
-            label_name = []
-            data = {}
-            current_issue = issue
-            # Get issue number
-            data['issue_number'] = current_issue["number"]
-            # Get created date of issue
-            if 'pull_request' in current_issue:
-                data['pull_created_at'] = current_issue["created_at"][0:10]                # key name 'pull_request' will be present for pull requests
-            else:
-                data['created_at'] = current_issue["created_at"][0:10]
-            #data['created_at'] = current_issue["created_at"][0:10]
-            if current_issue["closed_at"] == None:
-                data['closed_at'] = current_issue["closed_at"]
-            else:
-                # Get closed date of issue
-                data['closed_at'] = current_issue["closed_at"][0:10]
-            for label in current_issue["labels"]:
-                # Get label name of issue
-                label_name.append(label["name"])
-            data['labels'] = label_name
-            # It gives state of issue like closed or open
-            data['State'] = current_issue["state"]
-            # Get Author of issue
-            data['Author'] = current_issue["user"]["login"]
-            if 'pull_request' in current_issue:
-                pull_responses.append(data)                # key name 'pull_request' will be present for pull requests
-            else:
-                issues_reponse.append(data)
+    today = date.today()
+    '''
+    A repository already in the issue store only needs the issues and pull requests updated since its last sync.
+    Otherwise the past 24 months are fetched and saved in the store for the next request
+    '''
+    synced_at = datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
+    date_24m_back = today + dateutil.relativedelta.relativedelta(months=-24)
+    stored = sync_issue_store(repo_name, headers, token, date_24m_back, synced_at)
+    if stored is not None:
+        issues_reponse, pull_responses = stored
+    else:
+        issues_reponse, pull_responses, date_24m_back = fetch_issues_by_window(repo_name, headers, token)
+        if issue_store.enabled():
+            issue_store.replace(repo_name, issues_reponse + pull_responses, synced_at)
 
-        today = last_month
-        date_24m_back = last_month
-    
+    progress("issues")
 
     '''
     fetch commits data from the requested repository
@@ -351,63 +754,85 @@ def github():
     ranges = 'since=' + str(date_24m_back)
     per_page = 'per_page=100'
 
+    # only the committer date and sha of each commit are kept, page by page
+    commits_columns = ingest.EventColumns('commit_created_at')
 
-    # Append the search query to the GitHub API URL 
-    query_url_commits = repository_url + "/commits?" + ranges + "&" + per_page
-    # requsets.get will fetch requested query_url from the GitHub API
-    commits_response = requests.get(query_url_commits, headers=headers, params=params)
-    commits_response_headers = commits_response.headers
-    # Convert the data obtained from GitHub API to JSON format
-    commits_response = commits_response.json()
+    '''
+    With COMMITS_MODE=graphql or stats only the number of commits of each day is fetched (one record per commit,
+    whose sha is unknown). The commits are paged with the REST API in rest mode, or if those counts are not available
+    '''
+    commit_days = None
+    if COMMITS_MODE in ("graphql", "stats"):
+        commit_days = fetch_commit_days(repo_name, date_24m_back, today)
+    if commit_days is not None:
+        for day, count in sorted(commit_days.items(), reverse=True):
+            for n in range(count):
+                # synthetic id in place of the sha: the forecast service counts the non-null issue_number of each day
+                commits_columns.add(str(day), f'{day}-{n}')
+    else:
+        # Append the search query to the GitHub API URL 
+        query_url_commits = repository_url + "/commits?" + ranges + "&" + per_page
+        # requsets.get will fetch requested query_url from the GitHub API
+        commits_response = github_get(query_url_commits, headers=headers, params=params)
+        commits_response_headers = commits_response.headers
+        # Convert the data obtained from GitHub API to JSON format
+        commits_response = commits_response.json()
 
-    pagination_response_commits = pagination(commits_response_headers,query_url_commits, token, "commit")
-    commits_response.extend(pagination_response_commits)
+        def add_commits(commits_page):
+            for current_commit in commits_page:
+                if current_commit['commit']['committer'] is not None:
+                    commits_columns.add(current_commit['commit']['committer']['date'], current_commit['sha'])
 
-    commits_list = []
+        add_commits(commits_response)
+        del commits_response
+        pagination(commits_response_headers, query_url_commits, token, "commit", consume=add_commits)
 
-    for commit in commits_response:
-        label_name = []
-        data = {}
-        current_commit = commit
-        if current_commit['commit']['committer'] is not None:
-            data['commit_created_at'] = current_commit['commit']['committer']['date'][0:10]
-            data['issue_number'] = current_commit['sha']
-            commits_list.append(data)
+    commits_list = commits_columns.records()
 
     
+    progress("commits")
+
     '''
     branches
+    The head commit date of every branch is resolved in batches with GraphQL (BRANCHES_MODE=graphql).
+    With BRANCHES_MODE=rest, or if the GraphQL query fails, the head commit of each branch is fetched one by one
     '''
-    query_url_branches = repository_url + "/branches?" + per_page
-    # requsets.get will fetch requested query_url from the GitHub API
-    branches_response = requests.get(query_url_branches, headers=headers, params=params)
-    branches_response_headers = branches_response.headers
-    # Convert the data obtained from GitHub API to JSON format
-    branches_response = branches_response.json()
+    branches_list = None
+    if BRANCHES_MODE == "graphql":
+        branches_list = fetch_branches_graphql(repo_name, date_24m_back)
+    if branches_list is None:
+        query_url_branches = repository_url + "/branches?" + per_page
+        # requsets.get will fetch requested query_url from the GitHub API
+        branches_response = github_get(query_url_branches, headers=headers, params=params)
+        branches_response_headers = branches_response.headers
+        # Convert the data obtained from GitHub API to JSON format
+        branches_response = branches_response.json()
 
-    pagination_response_branches = pagination(branches_response_headers,query_url_branches, token, "branches")
-    branches_response.extend(pagination_response_branches)
+        pagination_response_branches = pagination(branches_response_headers,query_url_branches, token, "branches")
+        branches_response.extend(pagination_response_branches)
 
-    branches_list = []
+        branches_list = []
 
-    for branch in branches_response:
-        label_name = []
-        data = {}
-        current_branch = branch
-        if current_branch['commit']['url'] is not None:
-            commit_url = current_branch['commit']['url']
-            response = requests.get(commit_url, headers=headers, params=params)
-            response = response.json()
+        for branch in branches_response:
+            label_name = []
+            data = {}
+            current_branch = branch
+            if current_branch['commit']['url'] is not None:
+                commit_url = current_branch['commit']['url']
+                response = github_get(commit_url, headers=headers, params=params)
+                response = response.json()
             
-            if response['commit']['committer'] is not None:
-                data['branch_commit_at'] = response['commit']['committer']['date'][0:10]
-                data['issue_number'] = response['sha']
-                date_a = datetime.strptime(data['branch_commit_at'], '%Y-%m-%d')
-                #date_b = date_24m_back.strftime('%Y-%m-%d')
-                date_a = date_a.date()
-                if date_a < date_24m_back:
-                    continue
-                branches_list.append(data)
+                if response['commit']['committer'] is not None:
+                    data['branch_commit_at'] = response['commit']['committer']['date'][0:10]
+                    data['issue_number'] = response['sha']
+                    date_a = datetime.strptime(data['branch_commit_at'], '%Y-%m-%d')
+                    #date_b = date_24m_back.strftime('%Y-%m-%d')
+                    date_a = date_a.date()
+                    if date_a < date_24m_back:
+                        continue
+                    branches_list.append(data)
+
+    progress("branches")
 
     '''
     fetch releases data from the requested repository
@@ -418,7 +843,7 @@ def github():
     # Append the search query to the GitHub API URL 
     query_url_releases = repository_url + "/releases?" + per_page
     # requsets.get will fetch requested query_url from the GitHub API
-    releases_response = requests.get(query_url_releases, headers=headers, params=params)
+    releases_response = github_get(query_url_releases, headers=headers, params=params)
     releases_response_headers = releases_response.headers
     # Convert the data obtained from GitHub API to JSON format
     releases_response = releases_response.json()
@@ -439,76 +864,36 @@ def github():
             data['url'] = current_release['url']
             releases_list.append(data)
 
-    df = pd.DataFrame(issues_reponse)
-    df_pull = pd.DataFrame(pull_responses)   # pull requests dataframe
-
-    # Daily Created Issues
-    df_created_at = df.groupby(['created_at'], as_index=False).count()
-    dataFrameCreated = df_created_at[['created_at', 'issue_number']]
-    dataFrameCreated.columns = ['date', 'count']
+    progress("releases")
 
     '''
-    Monthly Created Issues
-    Format the data by grouping the data by month
-    ''' 
-    created_at = df['created_at']
-    month_issue_created = pd.to_datetime(
-        pd.Series(created_at), format='%Y-%m-%d')
-    month_issue_created.index = month_issue_created.dt.to_period('m')
-    month_issue_created = month_issue_created.groupby(level=0).size()
-    month_issue_created = month_issue_created.reindex(pd.period_range(
-        month_issue_created.index.min(), month_issue_created.index.max(), freq='m'), fill_value=0)
-    month_issue_created_dict = month_issue_created.to_dict()
-    created_at_issues = []
-    for key in month_issue_created_dict.keys():
-        array = [str(key), month_issue_created_dict[key]]
-        created_at_issues.append(array)
-
+    Daily, weekly and monthly series of every event type, computed in one vectorized pass
+    Series without any event are all zeros from date_24m_back to today
+    The daily counts are also saved in the series index read by /api/series
     '''
-    Monthly Closed Issues
-    Format the data by grouping the data by month
-    ''' 
-    
-    closed_at = df['closed_at'].sort_values(ascending=True)
-    month_issue_closed = pd.to_datetime(
-        pd.Series(closed_at), format='%Y-%m-%d')
-    month_issue_closed.index = month_issue_closed.dt.to_period('m')
-    month_issue_closed = month_issue_closed.groupby(level=0).size()
-    date_a = date.today().strftime('%Y-%m-%d')
-    date_b = date_24m_back.strftime('%Y-%m-%d')
-    if all(value is None for value in month_issue_closed):
-        month_issue_closed = pd.Series(0,index=pd.period_range(start=date_b, end=date_a, freq='m'))
-    else:
-        month_issue_closed = month_issue_closed.reindex(pd.period_range(
-            month_issue_closed.index.min(), month_issue_closed.index.max(), freq='m'), fill_value=0)
-    month_issue_closed_dict = month_issue_closed.to_dict()
-    closed_at_issues = []
-    for key in month_issue_closed_dict.keys():
-        array = [str(key), month_issue_closed_dict[key]]
-        closed_at_issues.append(array)
-    
-    '''
-    weekly Closed Issues
-    Format the data by grouping the data by week
-    ''' 
-    
-    closed_at = df['closed_at'].sort_values(ascending=True)
-    week_issue_closed = pd.to_datetime(
-        pd.Series(closed_at), format='%Y-%m-%d')
-    week_issue_closed.index = week_issue_closed.dt.to_period('w')
-    week_issue_closed = week_issue_closed.groupby(level=0).size()
-    date_a = date.today().strftime('%Y-%m-%d')
-    date_b = date_24m_back.strftime('%Y-%m-%d')
-    if all(value is None for value in week_issue_closed):
-        week_issue_closed = pd.Series(0,index=pd.period_range(start=date_b, end=date_a, freq='w'))
-    else:
-        week_issue_closed = week_issue_closed.reindex(pd.period_range(
-            week_issue_closed.index.min(), week_issue_closed.index.max(), freq='w'), fill_value=0)
-    week_issue_closed_dict = week_issue_closed.to_dict()
-    closed_at_issues_week = []
-    for key in week_issue_closed_dict.keys():
-        array = [str(key), week_issue_closed_dict[key]]
-        closed_at_issues_week.append(array)
+    events = {
+        "issues_created": [issue['created_at'] for issue in issues_reponse],
+        "issues_closed": [issue['closed_at'] for issue in issues_reponse],
+        "pulls_created": [pull['pull_created_at'] for pull in pull_responses],
+        "commits_created": [commit['commit_created_at'] for commit in commits_list],
+        "releases_created": [release['release_created_at'] for release in releases_list],
+        "branches_commit": [branch['branch_commit_at'] for branch in branches_list],
+    }
+    series = aggregation.aggregate(events, date_24m_back, date.today())
+    if series_index.enabled():
+        series_index.replace(repo_name, events, date_24m_back, date.today())
+    del events
+    # Monthly Created Issues
+    created_at_issues = series["issues_created"]["month"]
+    # Monthly Closed Issues
+    closed_at_issues = series["issues_closed"]["month"]
+    # weekly Closed Issues
+    closed_at_issues_week = series["issues_closed"]["week"]
+
+    emit("created", created_at_issues)
+    emit("closed", closed_at_issues)
+    emit("week_closed", closed_at_issues_week)
+    progress("aggregation")
 
     '''
         1. Hit LSTM Microservice by passing issues_response as body
@@ -551,113 +936,49 @@ def github():
         "issue_type": "branches"
     }
 
-    # Update your Google cloud deployed LSTM app URL (NOTE: DO NOT REMOVE "/")
-    LSTM_API_URL = "https://lstm-forecast-mx3slx5rea-uc.a.run.app/" + "api/forecast"
-    LSTM_API_URL_STAT = "https://lstm-forecast-mx3slx5rea-uc.a.run.app/" + "api/stat"
-    LSTM_API_URL_FB = "https://lstm-forecast-mx3slx5rea-uc.a.run.app/" + "api/fbprophet"
-
-
-    """ LSTM_API_URL = "http://127.0.0.1:8080/" + "api/forecast"
-    LSTM_API_URL_STAT = "http://127.0.0.1:8080/" + "api/stat"
-    LSTM_API_URL_FB = "http://127.0.0.1:8080/" + "api/fbprophet"
- """
-
     '''
-    Trigger the LSTM microservice to forecasted the created issues  (stat model)
-    The request body consists of created issues obtained from GitHub API in JSON format
+    Trigger the LSTM microservice to forecast every series with the LSTM, stat and fbprophet models
+    The request body consists of the series obtained from GitHub API in JSON format
     The response body consists of Google cloud storage path of the images generated by LSTM microservice
+    The requests are sent concurrently and each response is stored under its json_response key
     '''
-    closed_at_response_fb = requests.post(LSTM_API_URL_FB,
-                                       json=closed_at_body,
-                                       headers={'content-type': 'application/json'})
-    created_at_response = requests.post(LSTM_API_URL,
-                                        json=created_at_body,
-                                        headers={'content-type': 'application/json'})
-    created_at_response_stat = requests.post(LSTM_API_URL_STAT,
-                                        json=created_at_body,
-                                        headers={'content-type': 'application/json'})
-    created_at_response_fb = requests.post(LSTM_API_URL_FB,
-                                        json=created_at_body,
-                                        headers={'content-type': 'application/json'})
-    
+    forecast_bodies = {
+        "created": created_at_body,
+        "closed": closed_at_body,
+        "pulled": pull_requests_created_body,
+        "commits": commits_created_body,
+        "branches": branches_created_body,
+        "releases": releases_created_body,
+    }
+    forecast_models = {
+        "": LSTM_API_URL,
+        "Stat": LSTM_API_URL_STAT,
+        "Fb": LSTM_API_URL_FB,
+    }
+    # daily counts of each series, sent instead of the records when FORECAST_PAYLOAD is compact or batch
+    compact_payloads = {}
+    if forecast_payload.FORECAST_PAYLOAD != "full":
+        daily_counts = {
+            "created": series["issues_created"]["day"],
+            "closed": series["issues_closed"]["day"],
+            "pulled": series["pulls_created"]["day"],
+            "commits": series["commits_created"]["day"],
+            "branches": series["branches_commit"]["day"],
+            "releases": series["releases_created"]["day"],
+        }
+        for series_name, forecast_body in forecast_bodies.items():
+            compact_payloads[series_name] = forecast_payload.CompactPayload(forecast_body, daily_counts[series_name])
+    forecast_requests = {}
+    for series_name, forecast_body in forecast_bodies.items():
+        for model, model_url in forecast_models.items():
+            # e.g. createdAtImageUrls, closedAtStatImageUrls, pulledAtFbImageUrls
+            forecast_requests[series_name + "At" + model + "ImageUrls"] = (
+                model_url, forecast_body, compact_payloads.get(series_name))
+    forecast_responses = post_forecasts(forecast_requests,
+                                        on_response=lambda key, forecast_response: emit(key, {**forecast_response}))
+
+    progress("forecasts")
 
-    '''
-    Trigger the LSTM microservice to forecasted the created issues
-    The request body consists of created issues obtained from GitHub API in JSON format
-    The response body consists of Google cloud storage path of the images generated by LSTM microservice
-    '''
-    
-    
-    '''
-    Trigger the LSTM microservice to forecasted the closed issues
-    The request body consists of closed issues obtained from GitHub API in JSON format
-    The response body consists of Google cloud storage path of the images generated by LSTM microservice
-    '''    
-    closed_at_response = requests.post(LSTM_API_URL,
-                                       json=closed_at_body,
-                                       headers={'content-type': 'application/json'})
-    closed_at_response_stat = requests.post(LSTM_API_URL_STAT,
-                                       json=closed_at_body,
-                                       headers={'content-type': 'application/json'})
-    
-    
-    
-    '''
-    Trigger the LSTM microservice to forecasted the pull issues
-    The request body consists of pull issues obtained from GitHub API in JSON format
-    The response body consists of Google cloud storage path of the images generated by LSTM microservice
-    '''
-    pull_created_at_response = requests.post(LSTM_API_URL,
-                                       json=pull_requests_created_body,
-                                       headers={'content-type': 'application/json'})
-    pull_created_at_response_stat = requests.post(LSTM_API_URL_STAT,
-                                       json=pull_requests_created_body,
-                                       headers={'content-type': 'application/json'})
-    pull_created_at_response_fb = requests.post(LSTM_API_URL_FB,
-                                       json=pull_requests_created_body,
-                                       headers={'content-type': 'application/json'})
-    
-    '''
-    Trigger the LSTM microservice to forecasted the commits
-    The request body consists of commits obtained from GitHub API in JSON format
-    The response body consists of Google cloud storage path of the images generated by LSTM microservice
-    '''
-    commits_created_at_response = requests.post(LSTM_API_URL,
-                                       json=commits_created_body,
-                                       headers={'content-type': 'application/json'})
-    commits_created_at_response_stat = requests.post(LSTM_API_URL_STAT,
-                                       json=commits_created_body,
-                                       headers={'content-type': 'application/json'})
-    commits_created_at_response_fb = requests.post(LSTM_API_URL_FB,
-                                       json=commits_created_body,
-                                       headers={'content-type': 'application/json'})
-    
-    '''
-    Trigger the LSTM microservice to forecasted the releases
-    The request body consists of releases obtained from GitHub API in JSON format
-    The response body consists of Google cloud storage path of the images generated by LSTM microservice
-    '''
-    releases_created_at_response = requests.post(LSTM_API_URL,
-                                       json=releases_created_body,
-                                       headers={'content-type': 'application/json'})
-    releases_created_at_response_stat = requests.post(LSTM_API_URL_STAT,
-                                       json=releases_created_body,
-                                       headers={'content-type': 'application/json'})
-    releases_created_at_response_fb = requests.post(LSTM_API_URL_FB,
-                                       json=releases_created_body,
-                                       headers={'content-type': 'application/json'})
-    
-    branches_created_at_response = requests.post(LSTM_API_URL,
-                                       json=branches_created_body,
-                                       headers={'content-type': 'application/json'})
-    branches_created_at_response_stat = requests.post(LSTM_API_URL_STAT,
-                                       json=branches_created_body,
-                                       headers={'content-type': 'application/json'})
-    branches_created_at_response_fb = requests.post(LSTM_API_URL_FB,
-                                       json=branches_created_body,
-                                       headers={'content-type': 'application/json'})
-    
-    
     '''
     Create the final response that consists of:
         1. GitHub repository data obtained from GitHub API
@@ -669,65 +990,325 @@ def github():
         "week_closed": closed_at_issues_week,
         "starCount": repository["stargazers_count"],
         "forkCount": repository["forks_count"],
-        "createdAtImageUrls": {
-            **created_at_response.json(),
-        },
-        "closedAtImageUrls": {
-            **closed_at_response.json(),
-        },
-        "pulledAtImageUrls": {
-            **pull_created_at_response.json(),
-        },
-        "commitsAtImageUrls": {
-            **commits_created_at_response.json(),
-        },
-        "branchesAtImageUrls": {
-            **branches_created_at_response.json(),
-        },
-        "releasesAtImageUrls": {
-            **releases_created_at_response.json(),
-        },
-        "createdAtStatImageUrls": {
-            **created_at_response_stat.json(),
-        },
-        "closedAtStatImageUrls": {
-            **closed_at_response_stat.json(),
-        },
-        "pulledAtStatImageUrls": {
-            **pull_created_at_response_stat.json(),
-        },
-        "commitsAtStatImageUrls": {
-            **commits_created_at_response_stat.json(),
-        },
-        "branchesAtStatImageUrls": {
-            **branches_created_at_response_stat.json(),
-        },
-        "releasesAtStatImageUrls": {
-            **releases_created_at_response_stat.json(),
-        },
-        "createdAtFbImageUrls": {
-            **created_at_response_fb.json(),
-        },
-        "closedAtFbImageUrls": {
-            **closed_at_response_fb.json(),
-        },
-        "pulledAtFbImageUrls": {
-            **pull_created_at_response_fb.json(),
-        },
-        "commitsAtFbImageUrls": {
-            **commits_created_at_response_fb.json(),
-        },
-        "branchesAtFbImageUrls": {
-            **branches_created_at_response_fb.json(),
-        },
-        "releasesAtFbImageUrls": {
-            **releases_created_at_response_fb.json(),
-        },
     }
+    for key, forecast_response in forecast_responses.items():
+        json_response[key] = {
+            **forecast_response,
+        }
+    return json_response
+
+
+'''
+function to count the issues and pull requests created in the past 24 months of a repository with a
+one-result search, to estimate the cost of its full pipeline before running it. Returns 0 if the search fails
+'''
+def probe_repo_size(repo_name):
+    today = date.today()
+    date_24m_back = today + dateutil.relativedelta.relativedelta(months=-24)
+    search_query = 'repo:' + repo_name + ' ' + 'created:' + str(date_24m_back) + '..' + str(today)
+    query_url = GITHUB_URL + "search/issues?q=" + search_query + "&" + 'per_page=1'
+    return github_get(query_url, params={"state": "open"}).json().get("total_count", 0)
+
+
+'''
+function to wait until admission control lets the full pipeline of a repository in (see admission.py),
+at most timeout seconds (None: as long as it takes). Returns the estimated cost to release once the run is over.
+Raises admission.Overloaded if there is no room
+'''
+def admit_repo_report(repo_name, timeout=admission.ADMISSION_QUEUE_TIMEOUT):
+    if not admission_control.enabled():
+        return 0
+    cost_mb = admission.estimate_mb(probe_repo_size(repo_name))
+    admission_control.acquire(cost_mb, timeout)
+    return cost_mb
+
+
+'''
+function to run build_repo_report within the budget of admission control
+'''
+def build_admitted_repo_report(repo_name, progress=None, emit=None, timeout=admission.ADMISSION_QUEUE_TIMEOUT):
+    cost_mb = admit_repo_report(repo_name, timeout)
+    try:
+        return build_repo_report(repo_name, progress=progress, emit=emit)
+    finally:
+        admission_control.release(cost_mb)
+
+
+'''
+function to compute the json_response of a /api/github request: the counts of the repositories when one of
+the status flags is set, otherwise the full pipeline of the repository (see build_repo_report), once
+admission control lets it in
+'''
+def build_github_response(repo_name, starlist_status, forklist_status, linechart_status, stackissues_status):
+    #if block will return the star count of each repo if starlist_status is request body is true
+
+    if(starlist_status):
+        repo_name = repo_name.split()
+        counts = fetch_repo_counts(repo_name, ["stars"])
+        json_response = {
+            "starsCount": [[r, counts[r]["stars"]] for r in repo_name]
+        }
+        return json_response
+    
+
+    #if block will return the fork count of each repo if forklist_status is request body is true
+
+    if(forklist_status):
+        repo_name = repo_name.split('$')
+        counts = fetch_repo_counts(repo_name, ["forks"])
+        json_response = {
+            "forksCount": [[r, counts[r]["forks"]] for r in repo_name]
+        }
+        return json_response
+    
+    #if block will return the count of issues created in the past 24 months of each repo
+
+    if(linechart_status):
+        repo_name = repo_name.split('*')
+        counts = fetch_repo_counts(repo_name, ["issues"])
+        json_response = {
+            "issuesCount": [[r, counts[r]["issues"]] for r in repo_name]
+        }
+        return json_response
+    
+    #if block will return the open and closed issue counts of each repo
+
+    if(stackissues_status):
+        repo_name = repo_name.split('@')
+        counts = fetch_repo_counts(repo_name, ["issues_open", "issues_closed"])
+        json_response = {
+            "issuesCountOpen": [[r, counts[r]["issues_open"]] for r in repo_name],
+            "issuesCountClosed": [[r, counts[r]["issues_closed"]] for r in repo_name]
+        }
+        return json_response
+
+    return build_admitted_repo_report(repo_name)
+
+
+'''
+key of a /api/github request for the single-flight coalescing
+'''
+def github_request_key(repo_name, starlist_status, forklist_status, linechart_status, stackissues_status):
+    return (repo_name.strip(), bool(starlist_status), bool(forklist_status),
+            bool(linechart_status), bool(stackissues_status))
+
+
+'''
+function used by the warm-up thread to recompute the full result of a hot repository.
+It shares the computation of a user request for the same repository that is already in flight
+'''
+def warm_repo_report(repo_name):
+    return in_flight.do(github_request_key(repo_name, False, False, False, False),
+                        build_github_response, repo_name, False, False, False, False)
+
+
+# Background refresh of the hot repositories (WARMUP_REPOSITORIES)
+warmer = warmup.Warmer(warmup.WARMUP_REPOSITORIES, warm_repo_report)
+warmer.start()
+
+
+'''
+function to build the 503 response of a request refused by admission control
+'''
+def overloaded_response(overloaded):
+    error = {"error": "Service Overloaded"}
+    resp = Response(json.dumps(error), mimetype='application/json')
+    resp.status_code = 503
+    resp.headers["Retry-After"] = str(overloaded.retry_after)
+    return resp
+
+
+@app.route('/') 
+def home():
+    return render_template('home.html')
+'''
+API route path is  "/api/forecast"
+This API will accept only POST request
+'''
+@app.route('/api/github', methods=['POST'])
+def github():
+    body = request.get_json()
+    # Extract the choosen repositories from the request
+    repo_name = body['repository']
+    starlist_status = body['starlist_status']
+    forklist_status = body['forklist_status']
+    linechart_status = body['linechart_status']
+    stackissues_status = body['stackissues_status']
+    counts_status = starlist_status or forklist_status or linechart_status or stackissues_status
+    metrics.begin_request()
+
+    '''
+    Job mode: the full pipeline runs on the background worker pool and the job id is returned at once.
+    The status, stage progress and final json_response are polled from /api/jobs/<job_id>
+    The count branches are cheap and are always answered directly
+    '''
+    if body.get('job_mode', False) and not counts_status:
+        # a job waits in the queue until admission control lets it in
+        job = job_queue.submit(REPORT_STAGES,
+                               lambda repo_name, progress: build_admitted_repo_report(repo_name, progress=progress, timeout=None),
+                               repo_name)
+        json_response = {
+            "jobId": job.id,
+            "status": job.status,
+            "statusUrl": "/api/jobs/" + job.id
+        }
+        return jsonify(json_response), 202
+
+    '''
+    Hot repositories are answered from the result warmed up in the background, with the time it was computed
+    '''
+    if not counts_status and warmer.is_hot(repo_name):
+        warm = warmer.get(repo_name)
+        if warm is not None:
+            computed_at, json_response = warm
+            resp = jsonify({**json_response, "computedAt": datetime.utcfromtimestamp(computed_at).isoformat() + 'Z'})
+            resp.headers["Age"] = str(int(time.time() - computed_at))
+            return resp
+
+    '''
+    Identical requests arriving while one is in flight wait for it and share its json_response
+    '''
+    request_key = github_request_key(repo_name, starlist_status, forklist_status, linechart_status, stackissues_status)
+    try:
+        json_response = in_flight.do(request_key, build_github_response, repo_name, starlist_status,
+                                     forklist_status, linechart_status, stackissues_status)
+    except DataNotAvailable:
+        error = {"error": "Data Not Available"}
+        resp = Response(json.dumps(error), mimetype='application/json')
+        resp.status_code = 500
+        return resp
+    except admission.Overloaded as overloaded:
+        return overloaded_response(overloaded)
+    if not counts_status and warmer.is_hot(repo_name):
+        warmer.put(repo_name, json_response)
     # Return the response back to client (React app)
     return jsonify(json_response)
 
 
+'''
+API route path is "/api/github/stream"
+This API accepts the body of /api/github for a single repository and streams the json_response as
+newline delimited JSON: one {"section": key, "data": value} line per section as soon as it is computed,
+then {"done": true}, or {"error": "Data Not Available"} if the search fails
+'''
+@app.route('/api/github/stream', methods=['POST'])
+def github_stream():
+    body = request.get_json()
+    repo_name = body['repository']
+    lines = queue.Queue()
+    # admission is decided before the stream starts, so that a refused request still gets its 503
+    try:
+        cost_mb = admit_repo_report(repo_name)
+    except admission.Overloaded as overloaded:
+        return overloaded_response(overloaded)
+
+    def run():
+        try:
+            build_repo_report(repo_name, emit=lambda key, value: lines.put({"section": key, "data": value}))
+            lines.put({"done": True})
+        except DataNotAvailable:
+            lines.put({"error": "Data Not Available"})
+        except Exception as error:
+            lines.put({"error": str(error) or type(error).__name__})
+        finally:
+            admission_control.release(cost_mb)
+
+    def generate():
+        while True:
+            line = lines.get()
+            yield json.dumps(line) + "\n"
+            if "section" not in line:
+                break
+
+    # the pipeline runs on its own thread so that each section is sent as soon as it is emitted
+    threading.Thread(target=run, daemon=True).start()
+    return Response(generate(), mimetype='application/x-ndjson', headers={"X-Accel-Buffering": "no"})
+
+
+'''
+API route path is "/api/series"
+This API returns one series of a repository already computed by /api/github, from the series index:
+    repo    the repository, e.g. angular/angular
+    event   issues_created, issues_closed, pulls_created, commits_created, releases_created or branches_commit
+    freq    day (default), week or month
+    from/to YYYY-MM-DD, limited to (and by default) the 24 months covered by the last /api/github run of the repository
+'''
+@app.route('/api/series', methods=['GET'])
+def series_query():
+    def error_response(message, status_code):
+        resp = Response(json.dumps({"error": message}), mimetype='application/json')
+        resp.status_code = status_code
+        return resp
+
+    repo_name = request.args.get('repo', '').strip()
+    event = request.args.get('event', '')
+    freq = request.args.get('freq', 'day')
+    if not repo_name or event not in series_index.EVENTS or freq not in aggregation.FREQUENCIES:
+        return error_response("Invalid Series Query", 400)
+    if not series_index.enabled():
+        return error_response("Series Not Found", 404)
+    coverage = series_index.coverage(repo_name)
+    if coverage is None:
+        return error_response("Series Not Found", 404)
+    first_day, last_day, updated_at = coverage
+    try:
+        # Only the plain YYYY-MM-DD form, which the index reads the same way
+        start, end, first_day, last_day = [datetime.strptime(value, '%Y-%m-%d').date() for value in (
+            request.args.get('from', first_day), request.args.get('to', last_day), first_day, last_day)]
+    except ValueError:
+        return error_response("Invalid Series Query", 400)
+    # The index holds nothing outside the span of the run, so the range is limited to it
+    start, end = str(max(start, first_day)), str(min(end, last_day))
+    if start > end:
+        return error_response("Invalid Series Query", 400)
+    json_response = {
+        "repo": repo_name,
+        "event": event,
+        "freq": freq,
+        "from": start,
+        "to": end,
+        "updatedAt": datetime.utcfromtimestamp(updated_at).isoformat() + 'Z',
+        "series": series_index.query(repo_name, event, freq, start, end)
+    }
+    return jsonify(json_response)
+
+
+'''
+API route path is "/api/jobs/<job_id>"
+This API returns the status, the stage progress and, once done, the json_response of a job
+'''
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        error = {"error": "Job Not Found"}
+        resp = Response(json.dumps(error), mimetype='application/json')
+        resp.status_code = 404
+        return resp
+    return jsonify(job.to_dict())
+
+
+'''
+The stages timed while handling the request (and its total duration) are returned in its Server-Timing header
+'''
+@app.after_request
+def add_server_timing(response):
+    server_timing = metrics.server_timing()
+    if server_timing is not None:
+        response.headers["Server-Timing"] = server_timing
+    return response
+
+
+'''
+API route path is "/metrics"
+This API returns the stage latencies, upstream call counts and latencies, retries, rate limit sleeps and
+remaining budgets in the Prometheus text format
+'''
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(scheduler), mimetype='text/plain; version=0.0.4')
+
+
 # Run flask app server on port 5000
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,230 @@
+'''
+Offline benchmark of app.py against the local GitHub and forecast stand-ins (stub_github.py, stub_forecast.py).
+The stubs run in this process and app.py in a child process pointed at them with GITHUB_API_URL and LSTM_BASE_URL.
+For every scenario (full: the pipeline of a repository, counts: the four count branches) and repository size,
+requests are sent at the given concurrency and the report gives the p50/p95/p99 latency, the throughput,
+the upstream calls by endpoint and status, and the peak RSS of the app process.
+    python bench/run_bench.py --sizes 200,2000 --requests 20 --concurrency 4 --latency 20
+    python bench/run_bench.py --env FORECAST_PAYLOAD=compact --json compact.json
+    python bench/run_bench.py --server gunicorn --concurrency 32
+Every request of a size goes to one of --repos distinct repositories, so caches are hit as in production
+when --repos is small and mostly missed when it is large. The issue store and the warm-up are off unless set with --env.
+'''
+import argparse
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import stub_forecast
+import stub_github
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# separator of the repositories of each count branch of /api/github
+COUNT_FLAGS = {
+    "starlist_status": " ",
+    "forklist_status": "$",
+    "linechart_status": "*",
+    "stackissues_status": "@",
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+'''
+function to start app.py with the Flask server (without the debug reloader) or with gunicorn.conf.py,
+and wait until it answers
+'''
+def start_app(server, port, github_url, forecast_url, tokens, extra_env):
+    env = dict(os.environ)
+    env.update({
+        "GITHUB_API_URL": github_url,
+        "LSTM_BASE_URL": forecast_url,
+        "GITHUB_TOKEN": "bench",
+        "GITHUB_TOKENS": ",".join(f"bench{i}" for i in range(tokens)),
+        "ISSUE_STORE_PATH": "",
+        "WARMUP_REPOSITORIES": "",
+        "PORT": str(port),
+    })
+    env.update(extra_env)
+    if server == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "app:app"]
+    else:
+        command = [sys.executable, "-c", f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("app.py exited during start-up")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/metrics", timeout=1)
+            return process
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("app.py did not start within 60 seconds")
+
+
+'''
+peak resident set size in MB of a running process and its children, e.g. the gunicorn workers (Linux),
+None if it cannot be read
+'''
+def peak_rss(pid):
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            peak = sum(int(line.split()[1]) for line in status if line.startswith("VmHWM:")) / 1024
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            for child in children.read().split():
+                peak += peak_rss(int(child)) or 0
+    except OSError:
+        return None
+    return round(peak, 1)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def request_bodies(scenario, size, repos, count):
+    names = [f"bench/r{size}-{i}" for i in range(repos)]
+    bodies = []
+    for i in range(count):
+        body = {flag: False for flag in COUNT_FLAGS}
+        if scenario == "full":
+            body["repository"] = names[i % len(names)]
+        else:
+            flag = list(COUNT_FLAGS)[i % len(COUNT_FLAGS)]
+            body[flag] = True
+            body["repository"] = COUNT_FLAGS[flag].join(names)
+        bodies.append(body)
+    return bodies
+
+
+def run_scenario(app_url, scenario, size, args, github, forecast, pid):
+    github.reset_stats()
+    forecast.reset_stats()
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency))
+
+    def send(body):
+        started = time.time()
+        try:
+            status = session.post(app_url + "/api/github", json=body, timeout=args.timeout).status_code
+        except requests.RequestException as error:
+            status = type(error).__name__
+        return time.time() - started, status
+
+    bodies = request_bodies(scenario, size, args.repos, args.requests)
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(send, bodies))
+    elapsed = time.time() - started
+    latencies = [latency for latency, status in results if status == 200]
+    errors = {}
+    for latency, status in results:
+        if status != 200:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    return {
+        "scenario": scenario,
+        "size": size,
+        "requests": len(results),
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "github_calls": dict(sorted(github.stats.items())),
+        "forecast_calls": dict(sorted(forecast.stats.items())),
+        "forecast_bytes": forecast.bytes_received,
+        "peak_rss_mb": peak_rss(pid),
+    }
+
+
+def print_result(result):
+    print(f'{result["scenario"]:<7} size={result["size"]:<6} n={result["requests"]:<4} c={result["concurrency"]:<3} '
+          f'p50={result["p50_ms"]}ms p95={result["p95_ms"]}ms p99={result["p99_ms"]}ms '
+          f'{result["throughput_rps"]} req/s  peak RSS={result["peak_rss_mb"]} MB  errors={result["errors"] or 0}')
+    for name in ("github_calls", "forecast_calls"):
+        total = sum(result[name].values())
+        print(f'    {name} ({total}):')
+        for call, count in result[name].items():
+            print(f'        {count:>6}  {call}')
+    print(f'    forecast bytes received: {result["forecast_bytes"]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of app.py against local GitHub and forecast stubs")
+    parser.add_argument("--server", default="flask", help="flask (threaded development server) or gunicorn (gunicorn.conf.py)")
+    parser.add_argument("--scenarios", default="full,counts", help="comma separated: full, counts")
+    parser.add_argument("--sizes", default="200,2000", help="comma separated issues per repository")
+    parser.add_argument("--repos", type=int, default=1, help="distinct repositories per size")
+    parser.add_argument("--requests", type=int, default=20, help="requests per scenario and size")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=0, help="untimed requests per scenario and size first")
+    parser.add_argument("--latency", type=float, default=20, help="GitHub stub milliseconds per call")
+    parser.add_argument("--jitter", type=float, default=10, help="GitHub stub random extra milliseconds, up to")
+    parser.add_argument("--forecast-latency", type=float, default=200, help="forecast stub milliseconds per call")
+    parser.add_argument("--forecast-jitter", type=float, default=50)
+    parser.add_argument("--forecast-error-rate", type=float, default=0.0, help="fraction of forecast calls answered 503")
+    parser.add_argument("--forecast-slow-rate", type=float, default=0.0, help="fraction of forecast calls answered after --forecast-slow-latency")
+    parser.add_argument("--forecast-slow-latency", type=float, default=5000, help="milliseconds of a slow forecast call")
+    parser.add_argument("--failing-models", default="", help="comma separated models that always answer 503, e.g. stat")
+    parser.add_argument("--tokens", type=int, default=1, help="GitHub tokens of the pool (each has its own rate limits)")
+    parser.add_argument("--core-limit", type=int, default=5000, help="GitHub core calls per hour")
+    parser.add_argument("--search-limit", type=int, default=1000, help="GitHub search calls per minute (GitHub: 30)")
+    parser.add_argument("--graphql-limit", type=int, default=5000, help="GitHub GraphQL calls per hour")
+    parser.add_argument("--secondary-rate", type=float, default=0.0, help="fraction of GitHub calls rejected by a secondary rate limit")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for one /api/github response")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE environment of app.py, repeatable")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    limits = {"core": (3600, args.core_limit), "search": (60, args.search_limit), "graphql": (3600, args.graphql_limit)}
+    github = stub_github.serve(latency=args.latency, jitter=args.jitter, limits=limits, secondary_rate=args.secondary_rate)
+    forecast = stub_forecast.serve(latency=args.forecast_latency, jitter=args.forecast_jitter,
+                                   error_rate=args.forecast_error_rate, slow_rate=args.forecast_slow_rate,
+                                   slow_latency=args.forecast_slow_latency,
+                                   failing_models=[model for model in args.failing_models.split(",") if model])
+    extra_env = dict(setting.split("=", 1) for setting in args.env)
+    port = free_port()
+    process = start_app(args.server, port, f"http://127.0.0.1:{github.server_address[1]}/",
+                        f"http://127.0.0.1:{forecast.server_address[1]}/", args.tokens, extra_env)
+    app_url = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        for scenario in args.scenarios.split(","):
+            for size in [int(size) for size in args.sizes.split(",")]:
+                if args.warmup:
+                    warmup_args = argparse.Namespace(**{**vars(args), "requests": args.warmup})
+                    run_scenario(app_url, scenario, size, warmup_args, github, forecast, process.pid)
+                result = run_scenario(app_url, scenario, size, args, github, forecast, process.pid)
+                print_result(result)
+                results.append(result)
+    finally:
+        process.terminate()
+        process.wait()
+    # the peak RSS of the whole run, also where /proc is not available (ru_maxrss is in bytes on macOS)
+    max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    max_rss_mb = round(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    print(f"peak RSS of app.py: {max_rss_mb} MB")
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"settings": vars(args), "peak_rss_mb": max_rss_mb, "results": results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
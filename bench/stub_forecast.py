@@ -0,0 +1,121 @@
+'''
+Local stand-in of the LSTM forecast microservice for the benchmark (see run_bench.py).
+    POST /api/forecast, /api/stat, /api/fbprophet    one series (records or gzip-compressed daily_counts)
+    POST /api/forecast/batch                         every series and model of a repository at once
+Each model answers with image urls after latency (+ up to jitter) milliseconds, the batch endpoint once for all.
+To exercise the failure handling of the app, a fraction of calls (error_rate) can answer 503, a fraction
+(slow_rate) can take slow_latency milliseconds instead, and the models of failing_models always answer 503.
+    python bench/stub_forecast.py --port 8702 --latency 200
+'''
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+MODELS = ("forecast", "stat", "fbprophet")
+
+
+def image_urls(model, body):
+    name = f'{body.get("repo", "repo")}_{body.get("type", "series")}_{model}'
+    return {
+        "model_loss_image_url": f"https://storage.googleapis.com/bench/model_loss_{name}.png",
+        "lstm_generated_image_url": f"https://storage.googleapis.com/bench/generated_{name}.png",
+        "all_issues_data_image": f"https://storage.googleapis.com/bench/all_data_{name}.png",
+    }
+
+
+class StubForecast(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0, jitter=0, error_rate=0.0, slow_rate=0.0, slow_latency=0, failing_models=()):
+        super().__init__(address, StubForecastHandler)
+        self.latency = latency / 1000.0
+        self.jitter = jitter / 1000.0
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency / 1000.0
+        self.failing_models = set(failing_models)
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self.lock:
+            # "METHOD endpoint status" -> calls
+            self.stats = {}
+            self.bytes_received = 0
+
+    def count(self, method, endpoint, status, size):
+        key = f"{method} {endpoint} {status}"
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+            self.bytes_received += size
+
+
+class StubForecastHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, endpoint, size):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(self.command, endpoint, status, size)
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip('/')
+        data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = json.loads(gzip.decompress(data))
+        else:
+            body = json.loads(data or b'{}')
+        delay = self.server.latency + random.random() * self.server.jitter
+        if self.server.slow_rate and random.random() < self.server.slow_rate:
+            delay = self.server.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+        if path.split('/')[-1] in self.server.failing_models or (self.server.error_rate and random.random() < self.server.error_rate):
+            self.send_json(503, {"error": "Service Unavailable"}, path, len(data))
+            return
+        if path == "/api/forecast/batch":
+            results = {}
+            for forecast_request in body.get("requests", []):
+                series = body["series"].get(forecast_request["series"], {})
+                results[forecast_request["id"]] = image_urls(forecast_request["model"], series)
+            self.send_json(200, {"results": results}, path, len(data))
+            return
+        model = path.split('/')[-1]
+        if not path.startswith("/api/") or model not in MODELS:
+            self.send_json(404, {"error": "Not Found"}, path, len(data))
+            return
+        self.send_json(200, image_urls(model, body), path, len(data))
+
+
+def serve(port=0, latency=0, jitter=0, error_rate=0.0, slow_rate=0.0, slow_latency=0, failing_models=()):
+    server = StubForecast(("127.0.0.1", port), latency, jitter, error_rate, slow_rate, slow_latency, failing_models)
+    threading.Thread(target=server.serve_forever, name="stub-forecast", daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in of the LSTM forecast microservice")
+    parser.add_argument("--port", type=int, default=8702)
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra milliseconds, up to")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered 503")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of calls answered after --slow-latency")
+    parser.add_argument("--slow-latency", type=float, default=0, help="milliseconds of a slow call")
+    parser.add_argument("--failing-models", default="", help="comma separated models that always answer 503, e.g. stat")
+    args = parser.parse_args()
+    server = StubForecast(("127.0.0.1", args.port), args.latency, args.jitter, args.error_rate, args.slow_rate,
+                          args.slow_latency, [model for model in args.failing_models.split(",") if model])
+    print(f"stub forecast service on http://127.0.0.1:{server.server_address[1]}/")
+    server.serve_forever()
@@ -0,0 +1,387 @@
+'''
+Local stand-in of the GitHub API for the benchmark (see run_bench.py).
+Repositories are synthetic and deterministic: the number in the name of a repository is its number of
+issues and pull requests in the past 24 months (e.g. bench/r2000-0), commits, branches and releases scale with it.
+Served like GitHub:
+    GET  /repos/<owner>/<repo>                     with an ETag, 304 on If-None-Match (not charged)
+    GET  /search/issues                            repo:, created:a..b, updated:>=, type:issue and state: qualifiers,
+                                                   only the first 1000 results can be paged (422 beyond)
+    GET  /repos/<owner>/<repo>/commits[/<sha>]     since=
+    GET  /repos/<owner>/<repo>/branches
+    GET  /repos/<owner>/<repo>/releases
+    GET  /repos/<owner>/<repo>/stats/commit_activity   52 weeks of daily counts, 202 on the first call (computing)
+    POST /graphql                                  branch heads (refs), aliased repository/search counts and
+                                                   aliased commit history counts
+Lists are paginated with per_page/page and a Link header (rel="next" and rel="last"). Every response carries
+the X-RateLimit-* headers of its bucket (core, search, graphql), kept per token (Authorization header);
+an exhausted bucket answers 403 until its reset and a fraction of calls (secondary_rate) can be rejected
+with a secondary rate limit 403 and Retry-After.
+Every call waits latency (+ up to jitter) milliseconds.
+    python bench/stub_github.py --port 8701 --latency 20
+'''
+import argparse
+import calendar
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, urlencode
+
+DEFAULT_SIZE = 500
+SEARCH_RESULT_CAP = 1000
+
+# resource -> (window in seconds, default limit)
+RATE_LIMITS = {
+    "core": (3600, 5000),
+    "search": (60, 30),
+    "graphql": (3600, 5000),
+}
+
+
+def iso(day):
+    return day.isoformat() + "T00:00:00Z"
+
+
+'''
+synthetic content of one repository, generated from its name so that every run serves the same data
+'''
+class Repository:
+    def __init__(self, full_name, today):
+        self.full_name = full_name
+        match = re.search(r'(\d+)', full_name.split('/')[-1])
+        size = int(match.group(1)) if match else DEFAULT_SIZE
+        rng = random.Random(zlib.crc32(full_name.encode('utf-8')))
+        self.issues = []
+        for number in range(1, size + 1):
+            created = today - timedelta(days=rng.randrange(730))
+            closed = created + timedelta(days=rng.randrange(30)) if rng.random() < 0.6 else None
+            if closed is not None and closed > today:
+                closed = None
+            issue = {
+                "number": number,
+                "title": f"issue {number}",
+                "state": "closed" if closed else "open",
+                "created_at": iso(created),
+                "closed_at": iso(closed) if closed else None,
+                "updated_at": iso(closed or created),
+                "labels": [{"name": rng.choice(["bug", "enhancement", "docs"])}],
+                "user": {"login": f"user{rng.randrange(50)}"},
+            }
+            if rng.random() < 0.35:
+                issue["pull_request"] = {"url": ""}
+            self.issues.append(issue)
+        self.issues.sort(key=lambda issue: issue["created_at"], reverse=True)
+        self.commits = [{"sha": f"c{i:07d}", "commit": {"committer": {"date": iso(today - timedelta(days=rng.randrange(730)))}}}
+                        for i in range(size)]
+        self.commits.sort(key=lambda commit: commit["commit"]["committer"]["date"], reverse=True)
+        self.commits_by_sha = {commit["sha"]: commit for commit in self.commits}
+        self.commit_days = {}
+        for commit in self.commits:
+            day = commit["commit"]["committer"]["date"][:10]
+            self.commit_days[day] = self.commit_days.get(day, 0) + 1
+        # /stats/commit_activity answers 202 until it has been asked once
+        self.stats_computed = False
+        self.branches = [{"name": f"branch-{i}", "sha": self.commits[rng.randrange(len(self.commits))]["sha"] if self.commits else "c0"}
+                         for i in range(max(3, size // 50))]
+        self.releases = [{"id": i, "created_at": iso(today - timedelta(days=rng.randrange(730)))}
+                         for i in range(max(2, size // 100))]
+        self.stars = size * 7
+        self.forks = size * 2
+
+    def search(self, query):
+        items = self.issues
+        created = re.search(r'created:(\S+)\.\.(\S+)', query)
+        if created:
+            start, end = created.group(1), created.group(2)
+            if 'T' in start:
+                # time range, e.g. 2024-01-01T00:00:00+00:00..2024-01-01T11:59:59+00:00
+                start, end = start[:19], end[:19]
+                items = [issue for issue in items if start <= issue["created_at"][:19] <= end]
+            else:
+                items = [issue for issue in items if start <= issue["created_at"][:10] <= end]
+        updated = re.search(r'updated:>=(\S+)', query)
+        if updated:
+            items = [issue for issue in items if issue["updated_at"] >= updated.group(1)]
+        if 'type:issue' in query:
+            items = [issue for issue in items if "pull_request" not in issue]
+        state = re.search(r'state:(open|closed)', query)
+        if state:
+            items = [issue for issue in items if issue["state"] == state.group(1)]
+        return items
+
+
+class RateLimit:
+    def __init__(self, limits):
+        self.lock = threading.Lock()
+        self.limits = limits
+        # (token, resource) -> [remaining, reset]
+        self.buckets = {}
+
+    '''
+    charge one call of a token to a resource. Returns (allowed, headers)
+    '''
+    def charge(self, token, resource, charge=True):
+        window, limit = self.limits[resource]
+        now = time.time()
+        with self.lock:
+            bucket = self.buckets.get((token, resource))
+            if bucket is None or now >= bucket[1]:
+                bucket = self.buckets[(token, resource)] = [limit, int(now) + window]
+            allowed = bucket[0] > 0
+            if allowed and charge:
+                bucket[0] -= 1
+            remaining, reset = bucket
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Remaining": str(remaining),
+            "X-RateLimit-Reset": str(reset),
+            "X-RateLimit-Used": str(limit - remaining),
+            "X-RateLimit-Resource": resource,
+        }
+        return allowed, headers
+
+
+class StubGitHub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0, jitter=0, limits=None, secondary_rate=0.0):
+        super().__init__(address, StubGitHubHandler)
+        self.latency = latency / 1000.0
+        self.jitter = jitter / 1000.0
+        self.secondary_rate = secondary_rate
+        self.rate_limit = RateLimit(limits or {resource: (window, limit) for resource, (window, limit) in RATE_LIMITS.items()})
+        self.today = date.today()
+        self.lock = threading.Lock()
+        self.repositories = {}
+        self.reset_stats()
+
+    def repository(self, full_name):
+        with self.lock:
+            repository = self.repositories.get(full_name)
+            if repository is None:
+                repository = self.repositories[full_name] = Repository(full_name, self.today)
+            return repository
+
+    def reset_stats(self):
+        with self.lock:
+            # "METHOD endpoint status" -> calls
+            self.stats = {}
+
+    def count(self, method, endpoint, status):
+        key = f"{method} {endpoint} {status}"
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+
+class StubGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None, endpoint=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.count(self.command, endpoint or self.path.split('?')[0], status)
+
+    def paginate(self, items, query, headers, endpoint, wrap=None, cap=None):
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        reachable = items[:cap] if cap is not None else items
+        last_page = max(1, -(-len(reachable) // per_page))
+        if page > last_page and cap is not None and len(items) > cap:
+            self.send_json(422, {"message": "Only the first 1000 search results are available"}, headers, endpoint)
+            return
+        page_items = reachable[(page - 1) * per_page:page * per_page]
+        if last_page > 1:
+            base = {name: values[0] for name, values in query.items() if name != "page"}
+            url = f"http://{self.headers.get('Host')}{urlparse(self.path).path}?"
+            links = []
+            if page < last_page:
+                links.append(f'<{url}{urlencode({**base, "page": page + 1})}>; rel="next"')
+            links.append(f'<{url}{urlencode({**base, "page": last_page})}>; rel="last"')
+            headers = {**headers, "Link": ", ".join(links)}
+        body = wrap(page_items) if wrap else page_items
+        self.send_json(200, body, headers, endpoint)
+
+    def wait(self):
+        delay = self.server.latency + random.random() * self.server.jitter
+        if delay > 0:
+            time.sleep(delay)
+
+    '''
+    charge the call and answer 403 if its bucket is exhausted or a secondary rate limit is drawn.
+    Returns the rate limit headers, or None if the call was rejected
+    '''
+    def admit(self, resource, endpoint, charge=True):
+        allowed, headers = self.server.rate_limit.charge(self.headers.get("Authorization"), resource, charge)
+        if not allowed:
+            self.send_json(403, {"message": f"API rate limit exceeded ({resource})"}, headers, endpoint)
+            return None
+        if self.server.secondary_rate and random.random() < self.server.secondary_rate:
+            self.send_json(403, {"message": "You have exceeded a secondary rate limit"},
+                           {**headers, "Retry-After": "1"}, endpoint)
+            return None
+        return headers
+
+    def do_GET(self):
+        self.wait()
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip('/').split('/')
+        if parts[0] == "search" and len(parts) == 2 and parts[1] == "issues":
+            endpoint = "/search/issues"
+            headers = self.admit("search", endpoint)
+            if headers is None:
+                return
+            search_query = query.get("q", [""])[0]
+            repo = re.search(r'repo:(\S+)', search_query)
+            items = self.server.repository(repo.group(1)).search(search_query) if repo else []
+            self.paginate(items, query, headers, endpoint, cap=SEARCH_RESULT_CAP,
+                          wrap=lambda page_items: {"total_count": len(items), "incomplete_results": False, "items": page_items})
+            return
+        if parts[0] != "repos" or len(parts) < 3:
+            self.send_json(404, {"message": "Not Found"}, endpoint="other")
+            return
+        full_name = parts[1] + "/" + parts[2]
+        repository = self.server.repository(full_name)
+        base = f"http://{self.headers.get('Host')}/repos/{full_name}"
+        if len(parts) == 3:
+            endpoint = "/repos/:owner/:repo"
+            etag = '"' + format(zlib.crc32(full_name.encode('utf-8')), 'x') + '"'
+            not_modified = self.headers.get("If-None-Match") == etag
+            headers = self.admit("core", endpoint, charge=not not_modified)
+            if headers is None:
+                return
+            if not_modified:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.server.count(self.command, endpoint, 304)
+                return
+            self.send_json(200, {"full_name": full_name, "stargazers_count": repository.stars,
+                                 "forks_count": repository.forks}, {**headers, "ETag": etag}, endpoint)
+            return
+        if parts[3] == "stats" and len(parts) == 5 and parts[4] == "commit_activity":
+            endpoint = "/repos/:owner/:repo/stats/commit_activity"
+            headers = self.admit("core", endpoint)
+            if headers is None:
+                return
+            if not repository.stats_computed:
+                repository.stats_computed = True
+                self.send_json(202, {}, headers, endpoint)
+                return
+            today = self.server.today
+            # weeks start on Sunday, the last one is the current week
+            last_week = today - timedelta(days=(today.weekday() + 1) % 7)
+            weeks = []
+            for week in range(51, -1, -1):
+                week_start = last_week - timedelta(weeks=week)
+                days = [repository.commit_days.get(str(week_start + timedelta(days=offset)), 0) for offset in range(7)]
+                weeks.append({"days": days, "total": sum(days), "week": calendar.timegm(week_start.timetuple())})
+            self.send_json(200, weeks, headers, endpoint)
+            return
+        if parts[3] == "commits" and len(parts) == 5:
+            endpoint = "/repos/:owner/:repo/commits/:sha"
+            headers = self.admit("core", endpoint)
+            if headers is None:
+                return
+            commit = repository.commits_by_sha.get(parts[4])
+            if commit is None:
+                self.send_json(404, {"message": "Not Found"}, headers, endpoint)
+                return
+            self.send_json(200, commit, headers, endpoint)
+            return
+        endpoint = "/repos/:owner/:repo/" + parts[3]
+        if len(parts) != 4 or parts[3] not in ("commits", "branches", "releases"):
+            self.send_json(404, {"message": "Not Found"}, endpoint="other")
+            return
+        headers = self.admit("core", endpoint)
+        if headers is None:
+            return
+        if parts[3] == "commits":
+            since = query.get("since", [""])[0]
+            items = [commit for commit in repository.commits if commit["commit"]["committer"]["date"][:10] >= since[:10]]
+        elif parts[3] == "branches":
+            items = [{"name": branch["name"], "commit": {"sha": branch["sha"], "url": f"{base}/commits/{branch['sha']}"}}
+                     for branch in repository.branches]
+        else:
+            items = [{"id": release["id"], "url": f"{base}/releases/{release['id']}", "created_at": release["created_at"],
+                      "published_at": release["created_at"]} for release in repository.releases]
+        self.paginate(items, query, headers, endpoint)
+
+    def do_POST(self):
+        self.wait()
+        endpoint = "/graphql"
+        if urlparse(self.path).path.rstrip('/') != "/graphql":
+            self.send_json(404, {"message": "Not Found"}, endpoint="other")
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        headers = self.admit("graphql", endpoint)
+        if headers is None:
+            return
+        query = body.get("query", "")
+        variables = body.get("variables") or {}
+        if "history(" in query:
+            repository = self.server.repository(variables["owner"] + "/" + variables["name"])
+            target = {}
+            for alias, since, until in re.findall(r'(\w+): history\(since: "([^"]+)", until: "([^"]+)"\)', query):
+                count = sum(commits for day, commits in repository.commit_days.items() if since[:10] <= day <= until[:10])
+                target[alias] = {"totalCount": count}
+            self.send_json(200, {"data": {"repository": {"defaultBranchRef": {"target": target}}}}, headers, endpoint)
+            return
+        if "refs(" in query:
+            repository = self.server.repository(variables["owner"] + "/" + variables["name"])
+            start = int(variables.get("cursor") or 0)
+            branches = repository.branches[start:start + 100]
+            nodes = [{"name": branch["name"],
+                      "target": {"oid": branch["sha"],
+                                 "committedDate": repository.commits_by_sha[branch["sha"]]["commit"]["committer"]["date"]}}
+                     for branch in branches]
+            has_next = start + 100 < len(repository.branches)
+            refs = {"pageInfo": {"hasNextPage": has_next, "endCursor": str(start + 100) if has_next else None}, "nodes": nodes}
+            self.send_json(200, {"data": {"repository": {"refs": refs}}}, headers, endpoint)
+            return
+        data = {}
+        for name, value in variables.items():
+            index = re.search(r'(\d+)$', name)
+            if name.startswith("owner") and index:
+                repository = self.server.repository(value + "/" + variables["name" + index.group(1)])
+                data["repo" + index.group(1)] = {"stargazerCount": repository.stars, "forkCount": repository.forks}
+            elif not name.startswith("name") and index:
+                repo = re.search(r'repo:(\S+)', value)
+                items = self.server.repository(repo.group(1)).search(value) if repo else []
+                data[name] = {"issueCount": len(items)}
+        self.send_json(200, {"data": data}, headers, endpoint)
+
+
+def serve(port=0, latency=0, jitter=0, limits=None, secondary_rate=0.0):
+    server = StubGitHub(("127.0.0.1", port), latency, jitter, limits, secondary_rate)
+    threading.Thread(target=server.serve_forever, name="stub-github", daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local stand-in of the GitHub API")
+    parser.add_argument("--port", type=int, default=8701)
+    parser.add_argument("--latency", type=float, default=0, help="milliseconds added to every call")
+    parser.add_argument("--jitter", type=float, default=0, help="random extra milliseconds, up to")
+    parser.add_argument("--secondary-rate", type=float, default=0.0, help="fraction of calls rejected by a secondary rate limit")
+    args = parser.parse_args()
+    server = StubGitHub(("127.0.0.1", args.port), args.latency, args.jitter, secondary_rate=args.secondary_rate)
+    print(f"stub GitHub API on http://127.0.0.1:{server.server_address[1]}/")
+    server.serve_forever()
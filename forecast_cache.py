@@ -0,0 +1,159 @@
+'''
+Content addressed cache of the forecast service responses.
+A forecast is keyed by a hash of the model endpoint, the type, issue_type and repo of the request body and its
+normalized series, so an unchanged repository does not trigger another LSTM/stat/Prophet run.
+Entries expire after FORECAST_CACHE_TTL seconds and the least recently used ones are evicted beyond
+FORECAST_CACHE_SIZE. Entries live in memory, or in FORECAST_CACHE_DIR on disk when it is set.
+'''
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+FORECAST_CACHE_TTL = float(os.environ.get('FORECAST_CACHE_TTL', 6 * 60 * 60))
+FORECAST_CACHE_SIZE = int(os.environ.get('FORECAST_CACHE_SIZE', 256))
+FORECAST_CACHE_DIR = os.environ.get('FORECAST_CACHE_DIR', '')
+
+
+'''
+function to hash the series of a forecast request. The records are normalized (sorted by their JSON form) so that
+the same series fetched in another order has the same digest. Compact payloads (see forecast_payload.py) are
+hashed by their daily counts
+'''
+def series_digest(forecast_body):
+    if "issues" in forecast_body:
+        series = sorted(json.dumps(record, sort_keys=True) for record in forecast_body["issues"])
+    else:
+        series = forecast_body.get("series")
+    return hashlib.sha256(json.dumps(series, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+'''
+digests of the series of one pipeline run: the same records are sent to every model (and the issues for both
+created_at and closed_at), so each list is hashed once and the digest is reused for all of its requests
+'''
+class SeriesDigests:
+    def __init__(self):
+        self.lock = threading.Lock()
+        # id of the records (or daily counts) -> (records, digest); the records are kept so that the id stays theirs
+        self.digests = {}
+
+    def get(self, forecast_body):
+        series = forecast_body["issues"] if "issues" in forecast_body else forecast_body.get("series")
+        with self.lock:
+            entry = self.digests.get(id(series))
+            if entry is None:
+                entry = self.digests[id(series)] = (series, series_digest(forecast_body))
+            return entry[1]
+
+
+'''
+function to compute the cache key of a forecast request from the model endpoint, the type, issue_type and repo
+of the request body and the digest of its series (computed here unless given)
+'''
+def forecast_key(model_url, forecast_body, digest=None):
+    if digest is None:
+        digest = series_digest(forecast_body)
+    content = {
+        "endpoint": model_url,
+        "type": forecast_body.get("type"),
+        "issue_type": forecast_body.get("issue_type"),
+        "repo": forecast_body.get("repo"),
+        "format": forecast_body.get("format", "records"),
+        "series": digest
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class MemoryBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, stored_at, value):
+        with self.lock:
+            self.entries[key] = (stored_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+
+'''
+one JSON file per entry; the file modification time is its last use, for the LRU eviction
+'''
+class DiskBackend:
+    def __init__(self, directory, max_entries):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def get(self, key):
+        try:
+            with open(self.path(key)) as entry_file:
+                entry = json.load(entry_file)
+            os.utime(self.path(key))
+        except (OSError, ValueError):
+            return None
+        return entry["stored_at"], entry["value"]
+
+    def put(self, key, stored_at, value):
+        entry_fd, entry_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(entry_fd, 'w') as entry_file:
+            json.dump({"stored_at": stored_at, "value": value}, entry_file)
+        os.replace(entry_path, self.path(key))
+        with self.lock:
+            entries = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.endswith('.json')]
+            if len(entries) > self.max_entries:
+                entries.sort(key=lambda entry: os.path.getmtime(entry))
+                for entry in entries[:len(entries) - self.max_entries]:
+                    try:
+                        os.remove(entry)
+                    except OSError:
+                        pass
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+
+class ForecastCache:
+    def __init__(self, ttl=FORECAST_CACHE_TTL, max_entries=FORECAST_CACHE_SIZE, directory=FORECAST_CACHE_DIR):
+        self.ttl = ttl
+        if directory:
+            self.backend = DiskBackend(directory, max_entries)
+        else:
+            self.backend = MemoryBackend(max_entries)
+
+    def get(self, key):
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.time() - stored_at > self.ttl:
+            self.backend.delete(key)
+            return None
+        return value
+
+    def put(self, key, value):
+        self.backend.put(key, time.time(), value)
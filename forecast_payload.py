@@ -0,0 +1,109 @@
+'''
+Compact payloads for the forecast service.
+Instead of the full list of issue/commit records, a compact payload carries only the daily counts of the
+series ("format": "daily_counts"), serialized and gzip-compressed once and reused for every model.
+FORECAST_PAYLOAD selects the format:
+    full      the original per-call body with every record
+    compact   one gzip-compressed daily_counts body per model and series
+    batch     a single request to FORECAST_BATCH_URL with every series and model, falling back to compact
+An endpoint that rejects the compact format is remembered and gets the full body from then on.
+'''
+import gzip
+import json
+import os
+import threading
+from urllib.parse import urlparse
+import http_client
+
+FORECAST_PAYLOAD = os.environ.get('FORECAST_PAYLOAD', 'full')
+FORECAST_BATCH_URL = os.environ.get('FORECAST_BATCH_URL', http_client.LSTM_BASE_URL + "api/forecast/batch")
+
+# status codes of an endpoint that does not understand the compact format
+UNSUPPORTED_STATUS = (400, 404, 405, 415, 422)
+
+unsupported_urls = set()
+unsupported_lock = threading.Lock()
+
+
+class CompactPayload:
+    def __init__(self, forecast_body, daily_counts):
+        self.body = {
+            "type": forecast_body["type"],
+            "repo": forecast_body["repo"],
+            "format": "daily_counts",
+            "series": daily_counts
+        }
+        if "issue_type" in forecast_body:
+            self.body["issue_type"] = forecast_body["issue_type"]
+        self.lock = threading.Lock()
+        self.encoded = None
+
+    '''
+    the gzip-compressed JSON of the payload, encoded on first use and shared by every model
+    '''
+    def data(self):
+        with self.lock:
+            if self.encoded is None:
+                self.encoded = gzip.compress(json.dumps(self.body).encode('utf-8'))
+            return self.encoded
+
+
+'''
+model name of a forecast endpoint, e.g. "stat" for .../api/stat
+'''
+def model_name(model_url):
+    return urlparse(model_url).path.rstrip('/').split('/')[-1]
+
+
+def compact_supported(model_url):
+    return FORECAST_PAYLOAD != 'full' and model_url not in unsupported_urls
+
+
+def mark_unsupported(model_url):
+    with unsupported_lock:
+        unsupported_urls.add(model_url)
+
+
+'''
+function to send a compact payload to one model.
+Returns the response, or None if the endpoint does not support the compact format
+'''
+def post_compact(model_url, payload):
+    response = http_client.post(model_url,
+                                data=payload.data(),
+                                headers={'content-type': 'application/json', 'content-encoding': 'gzip'})
+    if response.status_code in UNSUPPORTED_STATUS:
+        mark_unsupported(model_url)
+        return None
+    return response
+
+
+'''
+function to send every series and model in one request.
+batch maps a json_response key to a (model url, compact payload) pair. Returns {key: forecast response},
+or None if the batch endpoint is not available; a 5xx response is returned as is, for the circuit breaker
+of the batch endpoint (see forecast_resilience.py) to count it as a failure
+'''
+def post_batch(batch):
+    if FORECAST_BATCH_URL in unsupported_urls:
+        return None
+    series = {}
+    forecast_requests = []
+    for key, (model_url, payload) in batch.items():
+        series[payload.body["type"]] = payload.body
+        forecast_requests.append({"id": key, "model": model_name(model_url), "series": payload.body["type"]})
+    data = gzip.compress(json.dumps({"format": "daily_counts", "series": series, "requests": forecast_requests}).encode('utf-8'))
+    response = http_client.post(FORECAST_BATCH_URL,
+                                data=data,
+                                headers={'content-type': 'application/json', 'content-encoding': 'gzip'})
+    if response.status_code in UNSUPPORTED_STATUS:
+        mark_unsupported(FORECAST_BATCH_URL)
+        return None
+    if response.status_code >= 500:
+        return response
+    if response.status_code != 200:
+        return None
+    results = response.json().get("results", {})
+    if any(key not in results for key in batch):
+        return None
+    return {key: results[key] for key in batch}
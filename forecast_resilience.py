@@ -0,0 +1,137 @@
+'''
+Failure handling of the calls to the forecast models.
+Each model endpoint has a circuit breaker: after FORECAST_BREAKER_FAILURES consecutive failures (connection
+error, timeout, 5xx or a body that is not JSON) it opens and calls to the endpoint fail at once for
+FORECAST_BREAKER_COOLDOWN seconds; then a single trial call is let through, which closes it again on success.
+A failed call raises ForecastUnavailable so that the caller can return the other forecasts and mark this one.
+With FORECAST_HEDGE_AFTER set, a call still running after that many seconds is sent a second time and the first
+answer wins (the forecast service is idempotent); the slower call is left to finish in the background.
+Hedged calls run on a pool of FORECAST_HEDGE_WORKERS threads and the delay counts from the moment a call starts,
+so a call waiting for a free thread of the pool is never hedged.
+'''
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+import metrics
+
+FORECAST_BREAKER_FAILURES = int(os.environ.get('FORECAST_BREAKER_FAILURES', 3))
+FORECAST_BREAKER_COOLDOWN = float(os.environ.get('FORECAST_BREAKER_COOLDOWN', 60))
+# Seconds after which a slow forecast call is duplicated (unset: no hedging)
+FORECAST_HEDGE_AFTER = os.environ.get('FORECAST_HEDGE_AFTER')
+FORECAST_HEDGE_AFTER = float(FORECAST_HEDGE_AFTER) if FORECAST_HEDGE_AFTER else None
+# Threads running the calls (and their second calls) when hedging is on
+FORECAST_HEDGE_WORKERS = int(os.environ.get('FORECAST_HEDGE_WORKERS', 32))
+
+# json_response block of a forecast that failed
+UNAVAILABLE = {"error": "Forecast Not Available"}
+
+hedge_executor = ThreadPoolExecutor(max_workers=FORECAST_HEDGE_WORKERS, thread_name_prefix='hedge')
+
+
+class ForecastUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failures=FORECAST_BREAKER_FAILURES, cooldown=FORECAST_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_running = False
+
+    '''
+    whether a call may be sent: always while closed, once per cooldown (the trial call) while open
+    '''
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_running or time.time() - self.opened_at < self.cooldown:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.trial_running or self.consecutive_failures >= self.failures:
+                self.opened_at = time.time()
+            self.trial_running = False
+
+
+breakers = {}
+breakers_lock = threading.Lock()
+
+
+def breaker_for(model_url):
+    with breakers_lock:
+        breaker = breakers.get(model_url)
+        if breaker is None:
+            breaker = breakers[model_url] = CircuitBreaker()
+        return breaker
+
+
+'''
+function to run send() and, if FORECAST_HEDGE_AFTER is set and it is still running after that long,
+a second send(); returns the first response, or raises the error of the last one to fail
+'''
+def hedged(send):
+    if FORECAST_HEDGE_AFTER is None:
+        return send()
+    started = threading.Event()
+
+    def send_first():
+        started.set()
+        return send()
+
+    pending = {hedge_executor.submit(send_first)}
+    # the time spent waiting for a thread of the pool does not count
+    started.wait()
+    done, pending = wait(pending, timeout=FORECAST_HEDGE_AFTER)
+    if not done:
+        metrics.forecast_hedges.inc()
+        pending.add(hedge_executor.submit(send))
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not pending:
+            raise error
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+'''
+function to send a call to a model endpoint through its circuit breaker (and hedging).
+send() returns the response, which must be a 2xx-4xx JSON response, or any other result that is passed on as is
+(e.g. None when the endpoint declined the payload format, or the decoded batch responses).
+Returns the result; raises ForecastUnavailable if the breaker is open or the call failed
+'''
+def call(model_url, send):
+    breaker = breaker_for(model_url)
+    if not breaker.allow():
+        metrics.forecast_failures.inc(endpoint=metrics.endpoint_label(model_url), reason="breaker_open")
+        raise ForecastUnavailable(model_url)
+    try:
+        response = hedged(send)
+        if isinstance(response, requests.Response):
+            if response.status_code >= 500:
+                raise requests.HTTPError(f"status {response.status_code}", response=response)
+            response.json()
+    except Exception as error:
+        breaker.record_failure()
+        metrics.forecast_failures.inc(endpoint=metrics.endpoint_label(model_url), reason=type(error).__name__)
+        raise ForecastUnavailable(model_url) from error
+    breaker.record_success()
+    return response
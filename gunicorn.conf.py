@@ -0,0 +1,26 @@
+'''
+Production server settings: gunicorn -c gunicorn.conf.py app:app (the Dockerfile entry point).
+With the default gevent workers, sockets, sleeps, locks and threads are cooperative (monkey-patched by the
+worker), so a request waiting on GitHub, the rate limit scheduler or the LSTM microservice does not pin an
+OS thread and one worker serves up to WORKER_CONNECTIONS requests at the same time.
+The caches, the rate limit scheduler, single-flight and the job queue live in each worker process:
+with more than one worker, jobs must be polled on the worker that started them, so keep WEB_CONCURRENCY at 1
+unless requests are routed by repository.
+'''
+import os
+
+bind = "0.0.0.0:" + os.environ.get('PORT', '5000')
+# gevent (cooperative, one process serves many requests) or gthread (one OS thread per request)
+worker_class = os.environ.get('WORKER_CLASS', 'gevent')
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+# requests served at the same time by a gevent worker
+worker_connections = int(os.environ.get('WORKER_CONNECTIONS', 1000))
+# requests served at the same time by a gthread worker
+threads = int(os.environ.get('WEB_THREADS', 8))
+# the full pipeline of a large repository can take minutes
+timeout = int(os.environ.get('WEB_TIMEOUT', 900))
+graceful_timeout = 30
+keepalive = 5
+# the app (and its warm-up thread) is loaded in each worker, after gevent has patched the standard library
+preload_app = False
+accesslog = '-'
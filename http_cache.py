@@ -0,0 +1,129 @@
+'''
+Conditional-request cache for GitHub API responses.
+Bodies are stored with their ETag / Last-Modified validators. Within GITHUB_CACHE_TTL seconds an entry is
+served without any call; after that it is revalidated with If-None-Match / If-Modified-Since, and a
+304 Not Modified (which GitHub does not count against the rate limit) serves the stored body again.
+The cache is bounded by number of entries and total body size, evicting the least recently used entries.
+Only the endpoints of GITHUB_CACHE_ENDPOINTS are cached: the repository itself ("repo"), its releases and its
+branches barely change between requests, while commit pages and commit lookups are large and seldom asked twice.
+'''
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode, urlparse
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+GITHUB_CACHE_TTL = float(os.environ.get('GITHUB_CACHE_TTL', 60))
+GITHUB_CACHE_SIZE = int(os.environ.get('GITHUB_CACHE_SIZE', 512))
+GITHUB_CACHE_MAX_BYTES = int(os.environ.get('GITHUB_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+# Comma separated endpoints of a repository that are cached, named by the path segment after repos/{owner}/{repo}
+GITHUB_CACHE_ENDPOINTS = {endpoint.strip() for endpoint in
+                          os.environ.get('GITHUB_CACHE_ENDPOINTS', 'repo,releases,branches').split(',') if endpoint.strip()}
+
+
+'''
+endpoint of a repository url, e.g. "releases" for .../repos/{owner}/{repo}/releases and "repo" for
+.../repos/{owner}/{repo}; None for a url outside of a repository
+'''
+def repository_endpoint(url):
+    parts = urlparse(url).path.strip('/').split('/')
+    if 'repos' not in parts:
+        return None
+    rest = parts[parts.index('repos') + 3:]
+    return rest[0] if rest else 'repo'
+
+
+def cacheable(url):
+    return repository_endpoint(url) in GITHUB_CACHE_ENDPOINTS
+
+
+class CachedResponse:
+    def __init__(self, response):
+        self.url = response.url
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+        self.content = response.content
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        self.stored_at = time.time()
+
+    def is_fresh(self, ttl):
+        return time.time() - self.stored_at < ttl
+
+    '''
+    headers that make the next request conditional on this entry having changed
+    '''
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    '''
+    a new requests.Response with the stored body, so callers can use .json() and .headers as usual
+    '''
+    def to_response(self):
+        response = Response()
+        response.url = self.url
+        response.status_code = self.status_code
+        response.headers = CaseInsensitiveDict(self.headers)
+        response._content = self.content
+        response.encoding = 'utf-8'
+        return response
+
+
+class ResponseCache:
+    def __init__(self, ttl=GITHUB_CACHE_TTL, max_entries=GITHUB_CACHE_SIZE, max_bytes=GITHUB_CACHE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url
+        return url + '#' + urlencode(sorted(params.items()))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    '''
+    store a 200 response that carries a validator; anything else cannot be revalidated and is not cached
+    '''
+    def put(self, key, response):
+        if response.status_code != 200:
+            return
+        if 'ETag' not in response.headers and 'Last-Modified' not in response.headers:
+            return
+        entry = CachedResponse(response)
+        if len(entry.content) > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.content)
+            self.entries[key] = entry
+            self.size += len(entry.content)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted.content)
+
+    '''
+    mark an entry as revalidated (304 Not Modified) so it is fresh for another ttl
+    '''
+    def touch(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry.stored_at = time.time()
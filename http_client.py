@@ -0,0 +1,112 @@
+'''
+Shared HTTP client for the GitHub API and the LSTM forecast microservice.
+One requests.Session is kept per host, so connections (and their TLS handshakes) are reused
+by every call of a request and by every request served by this process.
+'''
+import os
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import metrics
+
+# Base urls of the GitHub API and of the LSTM microservice (NOTE: DO NOT REMOVE "/"), e.g. local stubs, see bench/
+GITHUB_API_URL = os.environ.get('GITHUB_API_URL', "https://api.github.com/")
+LSTM_BASE_URL = os.environ.get('LSTM_BASE_URL', "https://lstm-forecast-mx3slx5rea-uc.a.run.app/")
+GITHUB_HOST = urlparse(GITHUB_API_URL).netloc
+
+# Keep-alive connections kept open per host
+GITHUB_POOL_SIZE = int(os.environ.get('GITHUB_POOL_SIZE', 20))
+FORECAST_POOL_SIZE = int(os.environ.get('FORECAST_POOL_SIZE', 10))
+# Seconds to wait for a GitHub response
+GITHUB_TIMEOUT = float(os.environ.get('GITHUB_TIMEOUT', 30))
+# Seconds to connect to the forecast service and to wait for a forecast response
+FORECAST_CONNECT_TIMEOUT = float(os.environ.get('FORECAST_CONNECT_TIMEOUT', 10))
+FORECAST_TIMEOUT = float(os.environ.get('FORECAST_TIMEOUT', 300))
+# Response timeouts of single endpoints, by last path segment, e.g. "stat=60,fbprophet=120,forecast=600"
+FORECAST_ENDPOINT_TIMEOUTS = {
+    endpoint.strip(): float(seconds)
+    for endpoint, seconds in (setting.split('=', 1) for setting in os.environ.get('FORECAST_ENDPOINT_TIMEOUTS', '').split(',') if '=' in setting)
+}
+
+sessions = {}
+sessions_lock = threading.Lock()
+
+
+'''
+function to read the GitHub tokens of the pool: GITHUB_TOKENS (comma separated), or else GITHUB_TOKEN
+'''
+def github_tokens():
+    tokens = [token.strip() for token in os.environ.get('GITHUB_TOKENS', '').split(',') if token.strip()]
+    if not tokens and os.environ.get('GITHUB_TOKEN'):
+        tokens = [os.environ.get('GITHUB_TOKEN')]
+    return tokens
+
+
+'''
+function to build the headers sent by default to a host. GitHub calls are authenticated with the first token
+of the pool; calls sent through the rate limit scheduler get the token it picks instead
+'''
+def default_headers(host):
+    headers = {}
+    if host == GITHUB_HOST:
+        tokens = github_tokens()
+        if tokens:
+            headers["Authorization"] = f'token {tokens[0]}'
+    return headers
+
+
+'''
+function to get the pooled session of the host of url, creating it on first use
+'''
+def get_session(url):
+    host = urlparse(url).netloc
+    with sessions_lock:
+        session = sessions.get(host)
+        if session is None:
+            pool_size = GITHUB_POOL_SIZE if host == GITHUB_HOST else FORECAST_POOL_SIZE
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            session.headers.update(default_headers(host))
+            sessions[host] = session
+    return session
+
+
+'''
+function to tell the default timeout of a url: GITHUB_TIMEOUT for GitHub, otherwise FORECAST_CONNECT_TIMEOUT
+to connect and the FORECAST_ENDPOINT_TIMEOUTS entry of the endpoint (or FORECAST_TIMEOUT) for the response
+'''
+def default_timeout(url):
+    parsed = urlparse(url)
+    if parsed.netloc == GITHUB_HOST:
+        return GITHUB_TIMEOUT
+    endpoint = parsed.path.rstrip('/').split('/')[-1]
+    return (FORECAST_CONNECT_TIMEOUT, FORECAST_ENDPOINT_TIMEOUTS.get(endpoint, FORECAST_TIMEOUT))
+
+
+'''
+function to send a request on the pooled session of its host, with the default timeout of its url.
+Every call is counted and timed by host and endpoint (see metrics.py)
+'''
+def request(method, url, **kwargs):
+    if 'timeout' not in kwargs:
+        kwargs['timeout'] = default_timeout(url)
+    started = time.time()
+    try:
+        response = get_session(url).request(method, url, **kwargs)
+    except requests.RequestException as error:
+        metrics.observe_upstream(url, type(error).__name__, time.time() - started)
+        raise
+    metrics.observe_upstream(url, response.status_code, time.time() - started)
+    return response
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
@@ -0,0 +1,140 @@
+'''
+Streaming ingest of GitHub pages into compact columns.
+Only the fields used by the aggregation, the issue store and the forecast service are extracted from each page
+as it arrives; the decoded page can then be released instead of being kept until the end of the request.
+Dates are stored as day numbers (days since 1970-01-01) in typed arrays, and labels, authors and states are
+interned, so a repository with tens of thousands of items only keeps a few bytes per item.
+'''
+import threading
+from array import array
+from datetime import date, timedelta
+
+EPOCH = date(1970, 1, 1)
+# day number of a missing date, e.g. the closed_at of an open issue
+NO_DATE = -(2 ** 31)
+
+
+def to_day(timestamp):
+    if timestamp is None:
+        return NO_DATE
+    return (date.fromisoformat(timestamp[0:10]) - EPOCH).days
+
+
+def from_day(day):
+    if day == NO_DATE:
+        return None
+    return str(EPOCH + timedelta(days=day))
+
+
+'''
+table of the distinct strings of a column; the column itself only keeps their index
+'''
+class InternTable:
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def intern(self, value):
+        index = self.ids.get(value)
+        if index is None:
+            index = len(self.values)
+            self.ids[value] = index
+            self.values.append(value)
+        return index
+
+
+'''
+columns of the issues and pull requests returned by the search API
+'''
+class IssueColumns:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.numbers = array('i')
+        self.is_pull = array('b')
+        self.created = array('i')
+        self.closed = array('i')
+        self.states = array('i')
+        self.authors = array('i')
+        # labels of item i are label_ids[label_offsets[i]:label_offsets[i + 1]]
+        self.label_offsets = array('i', [0])
+        self.label_ids = array('i')
+        self.label_table = InternTable()
+        self.author_table = InternTable()
+        self.state_table = InternTable()
+        self.seen_numbers = set()
+
+    def __len__(self):
+        return len(self.numbers)
+
+    '''
+    function to extract the columns of one page of search items. Pages can arrive from several threads;
+    an item updated while the search is paged through can be returned twice and is only kept once
+    '''
+    def add_page(self, items):
+        with self.lock:
+            for issue in items:
+                if issue["number"] in self.seen_numbers:
+                    continue
+                self.seen_numbers.add(issue["number"])
+                self.numbers.append(issue["number"])
+                # key name 'pull_request' will be present for pull requests
+                self.is_pull.append('pull_request' in issue)
+                self.created.append(to_day(issue["created_at"]))
+                self.closed.append(to_day(issue["closed_at"]))
+                self.states.append(self.state_table.intern(issue["state"]))
+                self.authors.append(self.author_table.intern(issue["user"]["login"]))
+                for label in issue["labels"]:
+                    self.label_ids.append(self.label_table.intern(label["name"]))
+                self.label_offsets.append(len(self.label_ids))
+
+    '''
+    function to build the issue records (pulls=False) or the pull request records (pulls=True), newest first,
+    in the format github() sends to the forecast service and saves in the issue store
+    '''
+    def records(self, pulls):
+        records = []
+        labels = self.label_table.values
+        order = sorted(range(len(self.numbers)), key=lambda i: (self.created[i], self.numbers[i]), reverse=True)
+        for i in order:
+            if bool(self.is_pull[i]) != pulls:
+                continue
+            data = {}
+            data['issue_number'] = self.numbers[i]
+            if pulls:
+                data['pull_created_at'] = from_day(self.created[i])
+            else:
+                data['created_at'] = from_day(self.created[i])
+            data['closed_at'] = from_day(self.closed[i])
+            data['labels'] = [labels[label] for label in self.label_ids[self.label_offsets[i]:self.label_offsets[i + 1]]]
+            data['State'] = self.state_table.values[self.states[i]]
+            data['Author'] = self.author_table.values[self.authors[i]]
+            records.append(data)
+        return records
+
+
+'''
+columns of events that only carry a date and an id, e.g. commits
+'''
+class EventColumns:
+    def __init__(self, date_field):
+        self.lock = threading.Lock()
+        self.date_field = date_field
+        self.days = array('i')
+        self.ids = []
+
+    def __len__(self):
+        return len(self.days)
+
+    def add(self, timestamp, event_id):
+        with self.lock:
+            self.days.append(to_day(timestamp))
+            self.ids.append(event_id)
+
+    def records(self):
+        records = []
+        for day, event_id in zip(self.days, self.ids):
+            data = {}
+            data[self.date_field] = from_day(day)
+            data['issue_number'] = event_id
+            records.append(data)
+        return records
@@ -0,0 +1,125 @@
+'''
+Persistent store of the normalized issues and pull requests of each repository (SQLite on local disk).
+After a full fetch the records of a repository are saved together with the time the fetch started, so the
+next request only has to search for the items updated since then and merge them in.
+A full fetch is forced again every ISSUE_STORE_FULL_SYNC seconds to drop deleted or transferred issues.
+'''
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+
+# Set ISSUE_STORE_PATH to an empty value to disable the store
+ISSUE_STORE_PATH = os.environ.get('ISSUE_STORE_PATH', os.path.join(tempfile.gettempdir(), 'issue_store.sqlite3'))
+ISSUE_STORE_FULL_SYNC = float(os.environ.get('ISSUE_STORE_FULL_SYNC', 24 * 60 * 60))
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT NOT NULL,
+    issue_number INTEGER NOT NULL,
+    is_pull INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    closed_at TEXT,
+    labels TEXT NOT NULL,
+    state TEXT NOT NULL,
+    author TEXT,
+    PRIMARY KEY (repo, issue_number)
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    repo TEXT PRIMARY KEY,
+    last_sync TEXT NOT NULL,
+    full_sync_at REAL NOT NULL
+);
+'''
+
+
+def enabled():
+    return bool(ISSUE_STORE_PATH)
+
+
+def connect():
+    connection = sqlite3.connect(ISSUE_STORE_PATH, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+'''
+function to turn a record built by github() into a row of the issues table
+'''
+def to_row(repo, data):
+    is_pull = 'pull_created_at' in data
+    created_at = data['pull_created_at'] if is_pull else data['created_at']
+    return (repo, data['issue_number'], int(is_pull), created_at, data['closed_at'],
+            json.dumps(data['labels']), data['State'], data['Author'])
+
+
+'''
+function to turn a row of the issues table back into the record github() builds from the GitHub API
+'''
+def from_row(row):
+    issue_number, is_pull, created_at, closed_at, labels, state, author = row
+    data = {}
+    data['issue_number'] = issue_number
+    if is_pull:
+        data['pull_created_at'] = created_at
+    else:
+        data['created_at'] = created_at
+    data['closed_at'] = closed_at
+    data['labels'] = json.loads(labels)
+    data['State'] = state
+    data['Author'] = author
+    return data
+
+
+'''
+last_sync timestamp of a repository, or None if it has never been synced or its last full sync is too old
+'''
+def last_sync(repo):
+    with closing(connect()) as connection:
+        row = connection.execute(
+            'SELECT last_sync, full_sync_at FROM sync_state WHERE repo = ?', (repo,)).fetchone()
+    if row is None or time.time() - row[1] > ISSUE_STORE_FULL_SYNC:
+        return None
+    return row[0]
+
+
+'''
+function to replace every record of a repository after a full fetch
+'''
+def replace(repo, records, synced_at):
+    with closing(connect()) as connection, connection:
+        connection.execute('DELETE FROM issues WHERE repo = ?', (repo,))
+        connection.executemany('INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               [to_row(repo, data) for data in records])
+        connection.execute('INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)', (repo, synced_at, time.time()))
+
+
+'''
+function to merge the records updated since the last sync of a repository
+'''
+def merge(repo, records, synced_at):
+    with closing(connect()) as connection, connection:
+        connection.executemany('INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                               [to_row(repo, data) for data in records])
+        connection.execute('UPDATE sync_state SET last_sync = ? WHERE repo = ?', (synced_at, repo))
+
+
+'''
+function to load the issues and the pull requests of a repository created on or after since (newest first)
+'''
+def load(repo, since):
+    with closing(connect()) as connection:
+        rows = connection.execute(
+            'SELECT issue_number, is_pull, created_at, closed_at, labels, state, author FROM issues '
+            'WHERE repo = ? AND created_at >= ? ORDER BY created_at DESC, issue_number DESC',
+            (repo, str(since))).fetchall()
+    issues = []
+    pulls = []
+    for row in rows:
+        if row[1]:
+            pulls.append(from_row(row))
+        else:
+            issues.append(from_row(row))
+    return issues, pulls
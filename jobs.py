@@ -0,0 +1,99 @@
+'''
+Background jobs of the job mode of /api/github.
+A job runs the full pipeline of a repository on a bounded worker pool, so the Flask worker that received the
+request is released at once. Jobs are kept in memory for JOB_TTL seconds after they finish and are polled
+through /api/jobs/<job_id>. Polling must reach the instance that owns the job (e.g. Cloud Run session affinity).
+'''
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Maximum number of pipelines run at the same time in job mode
+JOB_MAX_WORKERS = int(os.environ.get('JOB_MAX_WORKERS', 2))
+# Seconds a finished job is kept for polling
+JOB_TTL = float(os.environ.get('JOB_TTL', 60 * 60))
+
+
+class Job:
+    def __init__(self, stages):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        # every stage is "pending", "running" or "done"
+        self.stages = {stage: "pending" for stage in stages}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    '''
+    mark a stage as done and the next pending stage as running
+    '''
+    def complete_stage(self, stage):
+        self.stages[stage] = "done"
+        for name, state in self.stages.items():
+            if state == "pending":
+                self.stages[name] = "running"
+                break
+
+    def start(self):
+        self.status = "running"
+        for name in self.stages:
+            self.stages[name] = "running"
+            break
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at
+        }
+
+
+class JobQueue:
+    def __init__(self, max_workers=JOB_MAX_WORKERS, ttl=JOB_TTL):
+        self.ttl = ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    '''
+    function to queue function(*args, progress=...) as a job; progress(stage) marks a stage as done
+    '''
+    def submit(self, stages, function, *args):
+        job = Job(stages)
+        with self.lock:
+            self.purge()
+            self.jobs[job.id] = job
+        self.executor.submit(self.run, job, function, args)
+        return job
+
+    def run(self, job, function, args):
+        job.start()
+        try:
+            job.result = function(*args, progress=job.complete_stage)
+            job.status = "done"
+        except Exception as error:
+            job.error = str(error) or type(error).__name__
+            job.status = "failed"
+        job.finished_at = time.time()
+
+    def get(self, job_id):
+        with self.lock:
+            self.purge()
+            return self.jobs.get(job_id)
+
+    '''
+    drop the jobs that finished more than ttl seconds ago (the caller holds the lock)
+    '''
+    def purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
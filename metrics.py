@@ -0,0 +1,177 @@
+'''
+In-process metrics of the service, exposed in the Prometheus text format on /metrics.
+    pipeline_stage_seconds         histogram of the duration of each stage of the full pipeline
+    upstream_request_seconds       histogram of the latency of GitHub and forecast calls by host and endpoint
+    upstream_requests_total        counter of GitHub and forecast calls by host, endpoint and status
+    github_retries_total           counter of GitHub calls retried after a rate limit
+    admission_rejected_total       counter of full pipelines refused by admission control (503)
+    forecast_failures_total        counter of failed forecast calls by endpoint and reason (incl. open circuit breaker)
+    forecast_hedged_total          counter of slow forecast calls sent a second time
+    github_rate_limit_sleeps_total / github_rate_limit_sleep_seconds_total
+                                   how often and how long calls were held back by the rate limit scheduler
+    github_rate_limit_remaining    remaining budget of each GitHub rate limit bucket
+The stages of the current request are also returned in its Server-Timing header.
+'''
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in labels) + '}'
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{format_labels(key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        # labels -> [count per bucket..., count, sum]
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = [0] * len(self.buckets) + [0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for key, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'{self.name}_bucket{format_labels(key + (("le", bound),))} {count}')
+                lines.append(f'{self.name}_bucket{format_labels(key + (("le", "+Inf"),))} {series[-2]}')
+                lines.append(f'{self.name}_count{format_labels(key)} {series[-2]}')
+                lines.append(f'{self.name}_sum{format_labels(key)} {series[-1]}')
+        return lines
+
+
+stage_seconds = Histogram('pipeline_stage_seconds', 'Duration of each stage of the full /api/github pipeline')
+upstream_seconds = Histogram('upstream_request_seconds', 'Latency of GitHub and forecast service calls')
+upstream_requests = Counter('upstream_requests_total', 'GitHub and forecast service calls')
+github_retries = Counter('github_retries_total', 'GitHub calls retried after a rate limit')
+admission_rejections = Counter('admission_rejected_total', 'Full pipelines refused by admission control')
+forecast_failures = Counter('forecast_failures_total', 'Failed forecast calls, including calls refused by an open circuit breaker')
+forecast_hedges = Counter('forecast_hedged_total', 'Slow forecast calls sent a second time')
+search_truncated_windows = Counter('search_truncated_windows_total', 'Issue search windows of one second over the search result cap, fetched incompletely')
+warmup_failures = Counter('warmup_failures_total', 'Background warm-ups of a hot repository that failed')
+
+# every GitHub path segment that names a repository or a commit is replaced to keep the label set small
+ENDPOINT_PATTERNS = [
+    (re.compile(r'^/repos/[^/]+/[^/]+'), '/repos/:owner/:repo'),
+    (re.compile(r'/commits/[^/]+$'), '/commits/:sha'),
+]
+
+
+'''
+endpoint label of a url, e.g. /repos/:owner/:repo/commits for https://api.github.com/repos/d3/d3/commits
+'''
+def endpoint_label(url):
+    path = urlparse(url).path
+    for pattern, replacement in ENDPOINT_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path
+
+
+def observe_upstream(url, status, seconds):
+    host = urlparse(url).netloc
+    endpoint = endpoint_label(url)
+    upstream_seconds.observe(seconds, host=host, endpoint=endpoint)
+    upstream_requests.inc(host=host, endpoint=endpoint, status=status)
+
+
+'''
+stage timings of the request handled by the current thread, for its Server-Timing header
+'''
+request_timings = threading.local()
+
+
+def begin_request():
+    request_timings.started = time.time()
+    request_timings.stages = []
+
+
+def server_timing():
+    started = getattr(request_timings, 'started', None)
+    if started is None:
+        return None
+    entries = [f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in request_timings.stages]
+    entries.append(f'total;dur={(time.time() - started) * 1000:.1f}')
+    request_timings.started = None
+    return ', '.join(entries)
+
+
+'''
+times consecutive stages: mark(stage) records the time since the previous mark (or since creation)
+as the duration of stage, then calls progress(stage)
+'''
+class StageTimer:
+    def __init__(self, progress=None):
+        self.progress = progress
+        self.last = time.time()
+
+    def mark(self, stage):
+        now = time.time()
+        seconds = now - self.last
+        self.last = now
+        stage_seconds.observe(seconds, stage=stage)
+        if getattr(request_timings, 'started', None) is not None:
+            request_timings.stages.append((stage, seconds))
+        if self.progress is not None:
+            self.progress(stage)
+
+
+'''
+function to render every metric in the Prometheus text format.
+scheduler is the rate limit scheduler whose sleeps and remaining budgets are reported
+'''
+def render(scheduler):
+    lines = []
+    for metric in (stage_seconds, upstream_seconds, upstream_requests, github_retries, admission_rejections,
+                   forecast_failures, forecast_hedges, search_truncated_windows, warmup_failures):
+        lines.extend(metric.render())
+    lines.extend(['# HELP github_rate_limit_sleeps_total Times a GitHub call was held back by the rate limit scheduler',
+                  '# TYPE github_rate_limit_sleeps_total counter',
+                  f'github_rate_limit_sleeps_total {scheduler.sleep_count}',
+                  '# HELP github_rate_limit_sleep_seconds_total Seconds GitHub calls were held back by the rate limit scheduler',
+                  '# TYPE github_rate_limit_sleep_seconds_total counter',
+                  f'github_rate_limit_sleep_seconds_total {scheduler.sleep_seconds}',
+                  '# HELP github_rate_limit_remaining Remaining budget of each GitHub rate limit bucket',
+                  '# TYPE github_rate_limit_remaining gauge'])
+    for resource, remaining in sorted(scheduler.remaining().items()):
+        if remaining is not None:
+            lines.append(f'github_rate_limit_remaining{{resource="{resource}"}} {remaining}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,195 @@
+'''
+Rate limit aware scheduling of GitHub API calls.
+GitHub keeps a separate budget per resource (core: 5000 requests/hour, search: 30 requests/minute).
+Every response carries X-RateLimit-Remaining / X-RateLimit-Reset for the bucket it was charged to and
+rejected calls carry Retry-After. The scheduler reads these headers and paces outgoing calls so that
+a bucket is not drained before its reset time, instead of re-polling after GitHub has rejected us.
+With a pool of tokens (GITHUB_TOKENS) every token has its own buckets: each call goes to the token with
+the most remaining budget for its resource, and exhausted or blocked tokens are skipped until their reset.
+'''
+import os
+import threading
+import time
+import http_client
+
+# Start spreading calls evenly until the reset time once a bucket has less than this fraction left
+GITHUB_PACE_BELOW = float(os.environ.get('GITHUB_PACE_BELOW', 0.2))
+# Wait used for secondary rate limits that come without Retry-After (GitHub asks for at least a minute)
+GITHUB_SECONDARY_WAIT = float(os.environ.get('GITHUB_SECONDARY_WAIT', 60))
+
+
+'''
+function to tell which rate limit bucket a GitHub API url is charged to
+'''
+def resource_for_url(url):
+    if '/search/' in url:
+        return 'search'
+    if url.rstrip('/').endswith('/graphql'):
+        return 'graphql'
+    return 'core'
+
+
+'''
+function to tell whether a GitHub response was rejected because of a (primary or secondary) rate limit
+'''
+def is_rate_limited(response):
+    if response.status_code not in (403, 429):
+        return False
+    if 'Retry-After' in response.headers:
+        return True
+    if response.headers.get('X-RateLimit-Remaining') == '0':
+        return True
+    try:
+        message = response.json().get('message', '')
+    except ValueError:
+        return False
+    return 'rate limit' in message.lower()
+
+
+class RateLimitBucket:
+    def __init__(self, resource, token=None):
+        self.resource = resource
+        self.token = token
+        self.lock = threading.Lock()
+        # limit/remaining/reset are unknown until the first response of this bucket is seen
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.blocked_until = 0
+        self.last_call = 0
+
+    '''
+    seconds to wait before the next call may be sent, 0 if it can go now
+    '''
+    def wait_time(self, now):
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.reset is not None and now >= self.reset:
+            # the window has rolled over, the budget is full again
+            self.remaining = self.limit
+            self.reset = None
+        if self.remaining is None or self.reset is None:
+            return 0
+        if self.remaining <= 0:
+            return self.reset - now
+        if self.limit and self.remaining <= self.limit * GITHUB_PACE_BELOW:
+            interval = (self.reset - now) / self.remaining
+            return max(0, self.last_call + interval - now)
+        return 0
+
+    def claim(self, now):
+        if self.remaining is not None:
+            self.remaining -= 1
+        self.last_call = now
+
+    def update(self, headers, now):
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        limit = headers.get('X-RateLimit-Limit')
+        if limit is not None:
+            self.limit = int(limit)
+        if remaining is not None and reset is not None:
+            remaining = int(remaining)
+            reset = float(reset)
+            if self.reset == reset and self.remaining is not None:
+                # calls still in flight are not reflected in the header yet
+                self.remaining = min(self.remaining, remaining)
+            else:
+                self.remaining = remaining
+            self.reset = reset
+        retry_after = headers.get('Retry-After')
+        if retry_after is not None:
+            self.blocked_until = max(self.blocked_until, now + float(retry_after))
+
+
+class RateLimitScheduler:
+    def __init__(self, tokens=None):
+        self.lock = threading.Lock()
+        # tokens of the pool, read from the environment on first use unless given
+        self.tokens = tokens
+        # (token, resource) -> bucket
+        self.buckets = {}
+        # number of times and total seconds callers were held back
+        self.sleep_count = 0
+        self.sleep_seconds = 0.0
+
+    def token_pool(self):
+        with self.lock:
+            if self.tokens is None:
+                # no token at all: unauthenticated calls, one bucket per resource
+                self.tokens = http_client.github_tokens() or [None]
+            return self.tokens
+
+    def bucket(self, resource, token=None):
+        with self.lock:
+            if (token, resource) not in self.buckets:
+                self.buckets[(token, resource)] = RateLimitBucket(resource, token)
+            return self.buckets[(token, resource)]
+
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleep_count += 1
+            self.sleep_seconds += seconds
+        time.sleep(seconds)
+
+    '''
+    block until a call may be sent on the given resource and claim one unit of the budget of the token
+    with the most remaining calls (a token not seen yet counts as full, ties go to the least recently used).
+    Returns the token to send the call with
+    '''
+    def acquire(self, resource):
+        buckets = [self.bucket(resource, token) for token in self.token_pool()]
+        while True:
+            best = None
+            shortest_wait = None
+            with self.lock:
+                now = time.time()
+                for bucket in buckets:
+                    with bucket.lock:
+                        wait = bucket.wait_time(now)
+                        if wait > 0:
+                            shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+                            continue
+                        rank = (float('inf') if bucket.remaining is None else bucket.remaining, -bucket.last_call)
+                        if best is None or rank > best[0]:
+                            best = (rank, bucket)
+                if best is not None:
+                    bucket = best[1]
+                    with bucket.lock:
+                        bucket.claim(now)
+                    return bucket.token
+            self.sleep(shortest_wait)
+
+    '''
+    record the rate limit headers of a response to a call sent with token.
+    GitHub reports the bucket in X-RateLimit-Resource
+    '''
+    def update(self, resource, response, token=None):
+        resource = response.headers.get('X-RateLimit-Resource', resource)
+        bucket = self.bucket(resource, token)
+        with bucket.lock:
+            now = time.time()
+            bucket.update(response.headers, now)
+            if is_rate_limited(response) and bucket.blocked_until <= now:
+                if bucket.remaining == 0 and bucket.reset is not None and bucket.reset > now:
+                    bucket.blocked_until = bucket.reset
+                else:
+                    bucket.blocked_until = now + GITHUB_SECONDARY_WAIT
+
+    '''
+    remaining budget of each resource, summed over the tokens whose budget is known
+    '''
+    def remaining(self):
+        with self.lock:
+            buckets = list(self.buckets.values())
+        remaining = {}
+        for bucket in buckets:
+            if bucket.remaining is None:
+                remaining.setdefault(bucket.resource, None)
+            else:
+                remaining[bucket.resource] = (remaining.get(bucket.resource) or 0) + bucket.remaining
+        return remaining
+
+
+# Scheduler shared by every GitHub call of this process
+scheduler = RateLimitScheduler()
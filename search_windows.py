@@ -0,0 +1,83 @@
+'''
+Planning of the created: date windows used to search the issues of a repository.
+GitHub search returns at most 1000 results per query, so a window whose total_count is over the cap
+is bisected into two smaller date ranges until every window can be fetched completely; a single day over the
+cap is bisected further into time ranges (UTC, down to one second).
+Windows are fetched concurrently; the search rate limit budget is enforced by the rate limit scheduler.
+'''
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, time, timedelta
+import dateutil.relativedelta
+
+SEARCH_RESULT_CAP = 1000
+# Maximum number of search windows fetched at the same time
+SEARCH_MAX_WORKERS = int(os.environ.get('SEARCH_MAX_WORKERS', 4))
+
+
+'''
+function to build one (start, end) window per month for the past months, newest first.
+Both ends are inclusive and consecutive windows do not overlap
+'''
+def month_windows(today, months):
+    windows = []
+    end = today
+    for i in range(months):
+        start = today + dateutil.relativedelta.relativedelta(months=-(i + 1))
+        windows.append((start, end))
+        end = start - timedelta(days=1)
+    return windows
+
+
+'''
+whether a window can be bisected: a window of days always can (a single day into time ranges),
+a time range until it is one second long
+'''
+def can_split(window):
+    start, end = window
+    return not isinstance(start, datetime) or start < end
+
+
+'''
+function to bisect a window into two non-overlapping halves, newest first.
+A window of several days is split into days, a single day into two time ranges of whole seconds
+'''
+def split_window(window):
+    start, end = window
+    if not isinstance(start, datetime):
+        if start == end:
+            start, end = datetime.combine(start, time.min), datetime.combine(end, time(23, 59, 59))
+        else:
+            middle = start + (end - start) // 2
+            return [(middle + timedelta(days=1), end), (start, middle)]
+    middle = start + timedelta(seconds=(end - start).total_seconds() // 2)
+    return [(middle + timedelta(seconds=1), end), (start, middle)]
+
+
+'''
+created: qualifier of a window, e.g. created:2024-01-01..2024-01-31 or, for a time range,
+created:2024-01-01T00:00:00+00:00..2024-01-01T11:59:59+00:00 (the + encoded, the query is put in the url as is)
+'''
+def created_range(window):
+    start, end = window
+    if isinstance(start, datetime):
+        return 'created:' + start.isoformat() + '%2B00:00..' + end.isoformat() + '%2B00:00'
+    return 'created:' + str(start) + '..' + str(end)
+
+
+'''
+function to fetch every window concurrently.
+fetch_window(window) keeps the items of the window itself (e.g. adds them to shared columns) and returns
+True, or returns False when the window is over the result cap and has to be split; both halves are then
+fetched in its place
+'''
+def collect_windows(windows, fetch_window, max_workers=SEARCH_MAX_WORKERS):
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        pending = {executor.submit(fetch_window, window): window for window in windows}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                window = pending.pop(future)
+                if not future.result():
+                    for half in split_window(window):
+                        pending[executor.submit(fetch_window, half)] = half
@@ -0,0 +1,93 @@
+'''
+Persistent index of the daily event counts of each repository (SQLite on local disk).
+Every full pipeline saves the number of events of each type per day (issues created and closed, pull requests,
+commits, releases and branch head commits). /api/series answers from it with a range scan of the days asked for,
+rolled up to weeks or months, without any GitHub call.
+'''
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import closing
+import numpy as np
+import aggregation
+
+# Set SERIES_INDEX_PATH to an empty value to disable the index
+SERIES_INDEX_PATH = os.environ.get('SERIES_INDEX_PATH', os.path.join(tempfile.gettempdir(), 'series_index.sqlite3'))
+
+# Event types of the index, as named by the aggregation of the full pipeline
+EVENTS = ("issues_created", "issues_closed", "pulls_created", "commits_created", "releases_created", "branches_commit")
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS daily_counts (
+    repo TEXT NOT NULL,
+    event TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (repo, event, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS indexed_repos (
+    repo TEXT PRIMARY KEY,
+    first_day INTEGER NOT NULL,
+    last_day INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+'''
+
+
+def enabled():
+    return bool(SERIES_INDEX_PATH)
+
+
+def connect():
+    connection = sqlite3.connect(SERIES_INDEX_PATH, timeout=30)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+'''
+function to replace the daily counts of a repository.
+events maps an event type to its list of 'YYYY-MM-DD' dates (see aggregation.aggregate); first_day and last_day
+(dates) are the span the pipeline covered, every day of it without a row counts 0
+'''
+def replace(repo, events, first_day, last_day):
+    rows = []
+    for event, dates in events.items():
+        days, counts = np.unique(aggregation.to_days(dates), return_counts=True)
+        rows.extend((repo, event, int(day), int(count)) for day, count in zip(days.tolist(), counts.tolist()))
+    first_day, last_day = aggregation.to_days([str(first_day), str(last_day)]).tolist()
+    with closing(connect()) as connection, connection:
+        connection.execute('DELETE FROM daily_counts WHERE repo = ?', (repo,))
+        connection.executemany('INSERT INTO daily_counts VALUES (?, ?, ?, ?)', rows)
+        connection.execute('INSERT OR REPLACE INTO indexed_repos VALUES (?, ?, ?, ?)',
+                           (repo, first_day, last_day, time.time()))
+
+
+'''
+(first day, last day, updated_at) of an indexed repository, the days as 'YYYY-MM-DD', or None if it is not indexed
+'''
+def coverage(repo):
+    with closing(connect()) as connection:
+        row = connection.execute(
+            'SELECT first_day, last_day, updated_at FROM indexed_repos WHERE repo = ?', (repo,)).fetchone()
+    if row is None:
+        return None
+    first_day, last_day = np.array(row[:2], dtype=np.int64).astype('datetime64[D]').astype(str).tolist()
+    return first_day, last_day, row[2]
+
+
+'''
+function to read the series of one event type of a repository from start to end ('YYYY-MM-DD', inclusive)
+at the frequency freq ("day", "week" or "month"). The first and last week or month only count the days
+of the range. Returns [[period, count], ...]
+'''
+def query(repo, event, freq, start, end):
+    first_day, last_day = aggregation.to_days([start, end]).tolist()
+    with closing(connect()) as connection:
+        rows = connection.execute(
+            'SELECT day, count FROM daily_counts WHERE repo = ? AND event = ? AND day BETWEEN ? AND ?',
+            (repo, event, first_day, last_day)).fetchall()
+    day_counts = np.zeros(last_day - first_day + 1, dtype=np.int64)
+    for day, count in rows:
+        day_counts[day - first_day] = count
+    return aggregation.rollup(day_counts, first_day, freq)
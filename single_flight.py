@@ -0,0 +1,43 @@
+'''
+Single-flight coalescing of identical in-flight requests.
+The first caller with a given key runs the computation; callers arriving with the same key while it is running
+wait for it and all receive its result (or its exception) instead of running the pipeline again.
+'''
+import threading
+
+
+class Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, function, *args, **kwargs):
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = Call()
+                self.calls[key] = call
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function(*args, **kwargs)
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
@@ -0,0 +1,76 @@
+'''
+Background warm-up of the full /api/github result of the repositories we serve constantly.
+A daemon thread recomputes the result of every repository of WARMUP_REPOSITORIES once per WARMUP_INTERVAL,
+staggered evenly over the interval, and skips a turn while the GitHub core budget is below
+WARMUP_MIN_REMAINING. Requests for these repositories are answered from the warm result while it is
+younger than WARMUP_MAX_AGE.
+'''
+import logging
+import os
+import threading
+import time
+import metrics
+from rate_limit import scheduler
+
+logger = logging.getLogger(__name__)
+
+# e.g. "angular/angular,angular/material,angular/angular-cli,d3/d3" (empty: no warm-up)
+WARMUP_REPOSITORIES = [repo.strip() for repo in os.environ.get('WARMUP_REPOSITORIES', '').split(',') if repo.strip()]
+WARMUP_INTERVAL = float(os.environ.get('WARMUP_INTERVAL', 30 * 60))
+WARMUP_MAX_AGE = float(os.environ.get('WARMUP_MAX_AGE', 2 * WARMUP_INTERVAL))
+WARMUP_MIN_REMAINING = int(os.environ.get('WARMUP_MIN_REMAINING', 1000))
+
+
+class Warmer:
+    def __init__(self, repositories, compute, interval=WARMUP_INTERVAL, max_age=WARMUP_MAX_AGE):
+        self.repositories = list(repositories)
+        self.compute = compute
+        self.interval = interval
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        # repository -> (computed_at, json_response)
+        self.results = {}
+        self.thread = None
+
+    def is_hot(self, repo_name):
+        return repo_name in self.repositories
+
+    def put(self, repo_name, json_response):
+        with self.lock:
+            self.results[repo_name] = (time.time(), json_response)
+
+    '''
+    the warm (computed_at, json_response) of a repository, or None if there is none younger than max_age
+    '''
+    def get(self, repo_name):
+        with self.lock:
+            result = self.results.get(repo_name)
+        if result is None or time.time() - result[0] > self.max_age:
+            return None
+        return result
+
+    def refresh(self, repo_name):
+        remaining = scheduler.remaining().get('core')
+        if remaining is not None and remaining < WARMUP_MIN_REMAINING:
+            return
+        try:
+            self.put(repo_name, self.compute(repo_name))
+        except Exception as error:
+            # the previous warm result is kept until it is older than max_age
+            metrics.warmup_failures.inc(repo=repo_name, reason=type(error).__name__)
+            logger.warning('warm-up of %s failed: %s', repo_name, error)
+
+    def run(self):
+        # one repository every interval / len(repositories) seconds
+        pause = self.interval / len(self.repositories)
+        while True:
+            for repo_name in self.repositories:
+                started = time.time()
+                self.refresh(repo_name)
+                time.sleep(max(0, pause - (time.time() - started)))
+
+    def start(self):
+        if not self.repositories or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+        self.thread.start()